@@ -16,7 +16,8 @@ import numpy as np
 # Visualizes a 5k test using the inputted env and policy for the given mission, terrain (xml model file)
 # ground friction (3-long array), and foot mass (float)
 def vis_5k_test(cassie_env, policy, mission, terrain, friction, foot_mass):
-    # Reload CassieSim object for new terrain
+    # Reload CassieSim object for new terrain. Each terrain file is only parsed
+    # the first time, later loads copy the cached model
     cassie_env.sim = CassieSim(terrain, reinit=True)
     # Load in mission
     with open(mission, 'rb') as mission_file:
@@ -43,7 +44,8 @@ def vis_5k_test(cassie_env, policy, mission, terrain, friction, foot_mass):
 # Runs a 5k test using the inputted env and policy for the given mission, terrain (xml model file)
 # ground friction (3-long array), and foot mass (float)
 def sim_5k_test(cassie_env, policy, mission, terrain, friction, foot_mass):
-    # Reload CassieSim object for new terrain
+    # Reload CassieSim object for new terrain. Each terrain file is only parsed
+    # the first time, later loads copy the cached model
     cassie_env.sim = CassieSim(terrain, reinit=True)
     # Load in mission
     with open(mission, 'rb') as mission_file:
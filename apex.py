@@ -1,4 +1,3 @@
-import torch
 import sys, pickle, argparse
 from util import color, print_logo, env_factory, create_logger, eval_policy, parse_previous
 
@@ -247,6 +246,9 @@ if __name__ == "__main__":
         parser.add_argument("--num_steps", type=int, default=5096, help="Number of sampled timesteps per gradient estimate")
         parser.add_argument("--use_gae", type=bool, default=True,help="Whether or not to calculate returns using Generalized Advantage Estimation")
         parser.add_argument("--num_procs", type=int, default=30, help="Number of threads to train on")
+        parser.add_argument("--envs_per_worker", type=int, default=1, help="Number of envs each sampling process steps with one batched policy forward (they all run only while num_steps / num_procs covers envs_per_worker * max_traj_len)")
+        parser.add_argument("--pipelined", default=False, action='store_true', help="Sample the next batch while optimizing the current one, and evaluate in the background. Iterations that finish during an evaluation are not all evaluated, the newest one is evaluated next")
+        parser.add_argument("--eval_procs", type=int, default=4, help="Number of background evaluation processes when pipelined")
         parser.add_argument("--max_grad_norm", type=float, default=0.05, help="Value to clip gradients at.")
         parser.add_argument("--max_traj_len", type=int, default=400, help="Max episode horizon")
         parser.add_argument("--recurrent",   action='store_true')
@@ -283,6 +285,7 @@ if __name__ == "__main__":
             run_args.simrate = 50
             print("manually choosing simrate as 50 (40 Hz)")
 
+        import torch
         policy = torch.load(args.path + "actor.pt")
         if args.eval:
             policy.eval()  # NOTE: for some reason the saved nodelta_neutral_stateest_symmetry policy needs this but it breaks all new policies...
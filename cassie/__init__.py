@@ -1,13 +1,35 @@
-from .cassie_playground import CassiePlayground
-from .cassie import CassieEnv_v2 as CassieEnv
-from .cassie_standing_env import CassieStandingEnv
-from .cassie import CassieEnv_v2
-from .cassie_noaccel_footdist_omniscient import CassieEnv_noaccel_footdist_omniscient
-from .cassie_footdist_env import CassieEnv_footdist
-from .cassie_noaccel_footdist_env import CassieEnv_noaccel_footdist
+# Env classes and the cassiemujoco interface are imported on first use, so
+# that importing the package (or one small module from it) doesn't load every
+# env, the reward functions and libcassiemujoco up front.
+import importlib
 
+_lazy_attrs = {
+    "CassiePlayground":                      (".cassie_playground", "CassiePlayground"),
+    "CassieEnv":                             (".cassie", "CassieEnv_v2"),
+    "CassieStandingEnv":                     (".cassie_standing_env", "CassieStandingEnv"),
+    "CassieEnv_v2":                          (".cassie", "CassieEnv_v2"),
+    "CassieEnv_noaccel_footdist_omniscient": (".cassie_noaccel_footdist_omniscient", "CassieEnv_noaccel_footdist_omniscient"),
+    "CassieEnv_footdist":                    (".cassie_footdist_env", "CassieEnv_footdist"),
+    "CassieEnv_noaccel_footdist":            (".cassie_noaccel_footdist_env", "CassieEnv_noaccel_footdist"),
+}
 
-from .cassiemujoco import *
+def __getattr__(name):
+    if name in _lazy_attrs:
+        module, attr = _lazy_attrs[name]
+        value = getattr(importlib.import_module(module, __name__), attr)
+    elif not name.startswith("__"):
+        # everything else the package used to re-export from cassiemujoco
+        try:
+            value = getattr(importlib.import_module(".cassiemujoco", __name__), name)
+        except AttributeError:
+            raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name)) from None
+    else:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(list(globals()) + list(_lazy_attrs))
 
 
 ##############
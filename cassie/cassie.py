@@ -1,10 +1,15 @@
 # Consolidated Cassie environment.
 
-from .cassiemujoco import pd_in_t, state_out_t, CassieSim, CassieVis
+from .cassiemujoco import pd_in_t, state_out_t, CassieSim, CassieVis, StepAccumulators, PDCommand, StateOutView
 
 from .trajectory import *
+from .trajectory.ref_table import get_ref_table
 from cassie.quaternion_function import *
 from .rewards import *
+from .rewards.reward_registry import RewardSnapshot, resolve_reward, clock_reward_variant
+from .rewards.clock_table import load_clock_tables
+from .obs_history import ObsHistory
+from .step_timer import StepTimer, step_timing_enabled
 
 from math import floor
 
@@ -15,17 +20,19 @@ import copy
 
 import pickle
 
-import torch
 
-# Load clock based reward functions from file
+# Load clock based reward functions from file, as phase tables shared by all envs
 def load_reward_clock_funcs(path):
-    with open(path, "rb") as f:
-        clock_funcs = pickle.load(f)
-    return clock_funcs
+    return load_clock_tables(path)
 
 
 class CassieEnv_v2:
-    def __init__(self, traj='walking', simrate=50, clock_based=True, state_est=True, dynamics_randomization=True, no_delta=True, learn_gains=False, ik_baseline=False, reward="iros_paper", history=0, **kwargs):
+    # methods timed when step timing is on, and the section they count towards
+    timed_sections = {"step": "step", "set_pd_input": "command_setup", "step_simulation": "simulation",
+                      "step_simulation_n": "simulation", "track_foot_flags": "foot_tracking",
+                      "compute_reward": "reward", "get_full_state": "observation", "check_termination": "termination"}
+
+    def __init__(self, traj='walking', simrate=50, clock_based=True, state_est=True, dynamics_randomization=True, no_delta=True, learn_gains=False, ik_baseline=False, reward="iros_paper", history=0, step_timing=False, **kwargs):
 
         dirname = os.path.dirname(__file__)
         #xml_path = os.path.join(dirname, "cassiemujoco", "cassie.xml")
@@ -52,6 +59,7 @@ class CassieEnv_v2:
 
 
         # CONFIGURE REF TRAJECTORY to use
+        self._ref_tables = {}   # id(trajectory) -> shared reference table
         if traj == "aslip":
             self.speeds = np.array([x / 10 for x in range(0, 21)])
             self.trajectories = getAllTrajectories(self.speeds)
@@ -70,42 +78,23 @@ class CassieEnv_v2:
             self.trajectory = CassieTrajectory(traj_path)
             self.speed = 0
 
-        # Names of Clock-Based reward functions
-        clock_rewards        =  ["clock_smooth", "clock_strict0.1", "clock_strict0.4",
-                                 "clock_smooth_aerial", "clock_strict0.1_aerial", "clock_strict0.4_aerial"]
-        aslip_clock_rewards   = ["aslip_clock_smooth", "aslip_clock_smooth_aerial",
-                                 "aslip_clock_strict0.1", "aslip_clock_strict0.1_aerial",
-                                 "aslip_clock_strict0.4", "aslip_clock_strict0.4_aerial"]
-        max_vel_clock_rewards = ["max_vel_clock_smooth", "max_vel_clock_strict0.1", "max_vel_clock_strict0.4",
-                                 "max_vel_clock_smooth_aerial", "max_vel_clock_strict0.1_aerial", "max_vel_clock_strict0.4_aerial"]
-
         # If Loading Clock-based Reward Func, do that
-        if self.reward_func in clock_rewards:
-            # TODO: Get dedicated reward funcs for clock reward
-            clock_funcs_path = os.path.join(dirname, "rewards", "reward_clock_funcs", "aslip_" + self.reward_func + ".pkl")
+        reward_name, clock_funcs_file = clock_reward_variant(self.reward_func)
+        if clock_funcs_file is not None:
+            clock_funcs_path = os.path.join(dirname, "rewards", "reward_clock_funcs", clock_funcs_file)
             self.reward_clock_funcs = load_reward_clock_funcs(clock_funcs_path)
-            self.left_clock = self.reward_clock_funcs["left"][-1]
-            self.right_clock = self.reward_clock_funcs["right"][-1]
-            self.reward_func = "clock"
-        elif self.reward_func in aslip_clock_rewards:
-            clock_funcs_path = os.path.join(dirname, "rewards", "reward_clock_funcs", self.reward_func + ".pkl")
-            self.reward_clock_funcs = load_reward_clock_funcs(clock_funcs_path)
-            self.left_clock = self.reward_clock_funcs["left"][self.traj_idx]
-            self.right_clock = self.reward_clock_funcs["right"][self.traj_idx]
-            self.reward_func = "aslip_clock"
-        elif self.reward_func in max_vel_clock_rewards:
-            # TODO: Get dedicated reward funcs for clock reward
-            clock_funcs_path = os.path.join(dirname, "rewards", "reward_clock_funcs", "aslip_" + self.reward_func[8:] + ".pkl")
-            self.reward_clock_funcs = load_reward_clock_funcs(clock_funcs_path)
-            self.left_clock = self.reward_clock_funcs["left"][-1]
-            self.right_clock = self.reward_clock_funcs["right"][-1]
-            self.reward_func = "max_vel_clock"
+            # aslip clock rewards have a clock per trajectory speed
+            clock_idx = self.traj_idx if reward_name == "aslip_clock" else -1
+            self.left_clock = self.reward_clock_funcs["left"][clock_idx]
+            self.right_clock = self.reward_clock_funcs["right"][clock_idx]
+            self.reward_func = reward_name
 
         self.observation_space, self.clock_inds, self.mirrored_obs = self.set_up_state_space()
 
         # Adds option for state history for FF nets
         self._obs = len(self.observation_space)
         self.history = history
+        self.state_history = ObsHistory(self._obs, self.history)
 
         self.observation_space = np.zeros(self._obs + self._obs * self.history)
 
@@ -120,10 +109,22 @@ class CassieEnv_v2:
             self.action_space = np.zeros(10)
 
 
-        self.u = pd_in_t()
+        # pd command reused for every sim step, self.u is its pd_in_t
+        self.pd_cmd = PDCommand()
+        self.u = self.pd_cmd.u
 
         # TODO: should probably initialize this to current state
-        self.cassie_state = state_out_t()
+        # sim steps write into this one state_out_t, read through state_view
+        self.state_view = StateOutView()
+        self.cassie_state = self.state_view.state
+
+        # state estimator values making up the robot state in get_full_state,
+        # gathered in one go (pelvis height first, then these fields in order)
+        self.robot_state_idx = np.concatenate([[StateOutView.fields["pelvis.position"].start + 2],
+                                               StateOutView.index(["pelvis.orientation", "motor.position",
+                                                                   "pelvis.translationalVelocity", "pelvis.rotationalVelocity",
+                                                                   "motor.velocity", "pelvis.translationalAcceleration",
+                                                                   "joint.position", "joint.velocity"])])
 
         self.simrate = simrate # simulate X mujoco steps with same pd target
                                 # 50 brings simulation from 2000Hz to exactly 40Hz
@@ -148,6 +149,12 @@ class CassieEnv_v2:
         self.pos_index = np.array([1,2,3,4,5,6,7,8,9,14,15,16,20,21,22,23,28,29,30,34])
         self.vel_index = np.array([0,1,2,3,4,5,6,7,8,12,13,14,18,19,20,21,25,26,27,31])
 
+        # Resolve the reward once, compute_reward just runs its kernel
+        self._reward_kernel, self._reward_ref, cutoff = resolve_reward(self, self.reward_func)
+        if cutoff is not None:
+            self.early_term_cutoff = cutoff
+        self.reward_snapshot = RewardSnapshot()
+
         # CONFIGURE OFFSET for No Delta Policies
         if self.aslip_traj:
             ref_pos, ref_vel = self.get_ref_state(self.phase)
@@ -159,6 +166,9 @@ class CassieEnv_v2:
 
         # global flat foot orientation, can be useful part of reward function:
         self.neutral_foot_orient = np.array([-0.24790886454547323, -0.24679713195445646, -0.6609396704367185, 0.663921021343526])
+
+        # per-substep foot tracking buffers for the fused sim step
+        self.substep_acc = StepAccumulators(self.simrate, self.neutral_foot_orient)
         
         # tracking various variables for reward funcs
         self.stepcount = 0
@@ -269,6 +279,23 @@ class CassieEnv_v2:
 
         self.debug = False
 
+        # optional per-section timing of step(), see step_timer.py
+        self.step_timer = StepTimer()
+        if step_timing_enabled(step_timing):
+            self.step_timer.instrument(self, self.timed_sections)
+
+    @property
+    def sim(self):
+        return self._sim
+
+    # body/geom ids looked up every step are resolved whenever the sim is set,
+    # since a sim loaded from another model file can have different ids
+    @sim.setter
+    def sim(self, sim):
+        self._sim = sim
+        self.body_ids = {name: sim.body_id(name) for name in ["left-foot", "right-foot", "left-tarsus", "right-tarsus"]}
+        self.floor_id = sim.geom_id("floor")
+
     def set_up_state_space(self):
 
         mjstate_size   = 40
@@ -314,56 +341,27 @@ class CassieEnv_v2:
 
         return observation_space, clock_inds, mirrored_obs
 
-    def step_simulation(self, action, learned_gains=None):
-
-        if not self.ik_baseline:
-            if self.aslip_traj and self.phase == self.phaselen - 1:
-                ref_pos, ref_vel = self.get_ref_state(0)
-            else:
-                ref_pos, ref_vel = self.get_ref_state(self.phase + self.phase_add)
-        else:
-            ref_pos = self.trajectory.ik_pos[self.simsteps]
+    def set_pd_input(self, action, learned_gains=None):
 
         if not self.no_delta:
-            self.offset = ref_pos[self.pos_idx]
+            if self.ik_baseline:
+                self.offset = self.trajectory.ik_pos[self.simsteps][self.pos_idx]
+            elif self.aslip_traj and self.phase == self.phaselen - 1:
+                self.offset = self.ref_table().motor_pos(0)
+            else:
+                self.offset = self.ref_table().motor_pos(self.phase + self.phase_add)
         target = action + self.offset
 
         if self.joint_rand:
             target -= self.joint_offsets[0:10]
 
-        foot_pos = np.zeros(6)
-        self.sim.foot_pos(foot_pos)
-        prev_foot = copy.deepcopy(foot_pos)
-        self.u = pd_in_t()
-        for i in range(5):
-
-            # TODO: move setting gains out of the loop?
-            # maybe write a wrapper for pd_in_t ?
-            if self.learn_gains == False:                
-                self.u.leftLeg.motorPd.pGain[i]  = self.P[i]
-                self.u.rightLeg.motorPd.pGain[i] = self.P[i]
-                self.u.leftLeg.motorPd.dGain[i]  = self.D[i]
-                self.u.rightLeg.motorPd.dGain[i] = self.D[i]
-            else:
-                self.u.leftLeg.motorPd.pGain[i]  = self.P[i] + learned_gains[i]
-                self.u.rightLeg.motorPd.pGain[i] = self.P[i] + learned_gains[5+i]
-                self.u.leftLeg.motorPd.dGain[i]  = self.D[i] + learned_gains[10+i]
-                self.u.rightLeg.motorPd.dGain[i] = self.D[i] + learned_gains[15+i]
-
-            self.u.leftLeg.motorPd.torque[i]  = 0 # Feedforward torque
-            self.u.rightLeg.motorPd.torque[i] = 0 
-
-            self.u.leftLeg.motorPd.pTarget[i]  = target[i]
-            self.u.rightLeg.motorPd.pTarget[i] = target[i + 5]
-
-            self.u.leftLeg.motorPd.dTarget[i]  = 0
-            self.u.rightLeg.motorPd.dTarget[i] = 0
+        if self.learn_gains:
+            self.pd_cmd.set_gains(np.tile(self.P, 2) + learned_gains[0:10], np.tile(self.D, 2) + learned_gains[10:20])
+        else:
+            self.pd_cmd.set_gains(self.P, self.D)
+        self.pd_cmd.set_targets(target)
 
-        self.cassie_state = self.sim.step_pd(self.u)
-        self.sim.foot_pos(foot_pos)
-        self.l_foot_vel = (foot_pos[0:3] - prev_foot[0:3]) / 0.0005
-        self.r_foot_vel = (foot_pos[3:6] - prev_foot[3:6]) / 0.0005
-        foot_forces = self.sim.get_foot_forces()
+    def update_foot_flags(self, foot_forces, foot_pos):
         if self.l_high and foot_forces[0] > 0:
             self.l_high = False
             self.stepcount += 1
@@ -384,48 +382,84 @@ class CassieEnv_v2:
         elif not self.r_swing and foot_pos[5] >= 0:
             self.r_swing = True
 
-    def step(self, action, return_omniscient_state=False):
-        
-        # reset mujoco tracking variables
-        self.l_foot_frc = 0
-        self.r_foot_frc = 0
+    # single mujoco substep
+    def step_simulation(self, action, learned_gains=None):
+        self.set_pd_input(action, learned_gains)
+
         foot_pos = np.zeros(6)
-        self.l_foot_pos = np.zeros(3)
-        self.r_foot_pos = np.zeros(3)
-        self.l_foot_orient_cost = 0
-        self.r_foot_orient_cost = 0
+        self.sim.foot_pos(foot_pos)
+        prev_foot = foot_pos.copy()
+
+        self.sim.step_pd(self.u, out=self.cassie_state)
+        self.sim.foot_pos(foot_pos)
+        self.l_foot_vel = (foot_pos[0:3] - prev_foot[0:3]) / 0.0005
+        self.r_foot_vel = (foot_pos[3:6] - prev_foot[3:6]) / 0.0005
+        self.update_foot_flags(self.sim.get_foot_forces(), foot_pos)
 
+    # n mujoco substeps with the same pd target, foot tracking goes into self.substep_acc
+    def step_simulation_n(self, action, n, learned_gains=None):
+        self.set_pd_input(action, learned_gains)
+
+        acc = self.substep_acc
+        self.sim.step_pd_n(self.u, n, acc, out=self.cassie_state)
+        self.simsteps += n
+
+        self.l_foot_vel = acc.foot_vel[0:3]
+        self.r_foot_vel = acc.foot_vel[3:6]
+        self.track_foot_flags(acc)
+
+    # foot flags over the substeps recorded in acc
+    def track_foot_flags(self, acc):
+        for foot_forces, foot_pos in zip(acc.frc_trace.tolist(), acc.pos_trace[1:].tolist()):
+            self.update_foot_flags(foot_forces, foot_pos)
+
+    def step(self, action, return_omniscient_state=False):
+        
+        learned_gains = None
         if self.learn_gains:
             action, learned_gains = action[0:10], action[10:]
 
-        for i in range(self.simrate):
-            if self.learn_gains:
+        if not self.ik_baseline:
+            # pd target is fixed for the whole step, so run all substeps in one call
+            self.step_simulation_n(action, self.simrate, learned_gains)
+            acc = self.substep_acc
+            self.l_foot_frc, self.r_foot_frc = acc.foot_frc
+            self.l_foot_pos = acc.foot_pos[0:3]
+            self.r_foot_pos = acc.foot_pos[3:6]
+            self.l_foot_orient_cost, self.r_foot_orient_cost = acc.foot_orient_cost
+        else:
+            # ik targets change every substep
+            self.l_foot_frc = 0
+            self.r_foot_frc = 0
+            foot_pos = np.zeros(6)
+            self.l_foot_pos = np.zeros(3)
+            self.r_foot_pos = np.zeros(3)
+            self.l_foot_orient_cost = 0
+            self.r_foot_orient_cost = 0
+
+            for i in range(self.simrate):
                 self.step_simulation(action, learned_gains)
-            else:
-                self.step_simulation(action)
-            self.simsteps += 1
-            qpos = np.copy(self.sim.qpos())
-            qvel = np.copy(self.sim.qvel())
-            # Foot Force Tracking
-            foot_forces = self.sim.get_foot_forces()
-            self.l_foot_frc += foot_forces[0]
-            self.r_foot_frc += foot_forces[1]
-            # Relative Foot Position tracking
-            self.sim.foot_pos(foot_pos)
-            self.l_foot_pos += foot_pos[0:3]
-            self.r_foot_pos += foot_pos[3:6]
-            # Foot Orientation Cost
-            self.l_foot_orient_cost += (1 - np.inner(self.neutral_foot_orient, self.sim.xquat("left-foot")) ** 2)
-            self.r_foot_orient_cost += (1 - np.inner(self.neutral_foot_orient, self.sim.xquat("right-foot")) ** 2)
-        
-        self.l_foot_frc              /= self.simrate
-        self.r_foot_frc              /= self.simrate        
-        self.l_foot_pos              /= self.simrate
-        self.r_foot_pos              /= self.simrate
-        self.l_foot_orient_cost      /= self.simrate
-        self.r_foot_orient_cost      /= self.simrate
-
-        height = self.sim.qpos()[2]
+                self.simsteps += 1
+                # Foot Force Tracking
+                foot_forces = self.sim.get_foot_forces()
+                self.l_foot_frc += foot_forces[0]
+                self.r_foot_frc += foot_forces[1]
+                # Relative Foot Position tracking
+                self.sim.foot_pos(foot_pos)
+                self.l_foot_pos += foot_pos[0:3]
+                self.r_foot_pos += foot_pos[3:6]
+                # Foot Orientation Cost
+                self.l_foot_orient_cost += (1 - np.inner(self.neutral_foot_orient, self.sim.xquat_id(self.body_ids["left-foot"], copy=False)) ** 2)
+                self.r_foot_orient_cost += (1 - np.inner(self.neutral_foot_orient, self.sim.xquat_id(self.body_ids["right-foot"], copy=False)) ** 2)
+
+            self.l_foot_frc              /= self.simrate
+            self.r_foot_frc              /= self.simrate        
+            self.l_foot_pos              /= self.simrate
+            self.r_foot_pos              /= self.simrate
+            self.l_foot_orient_cost      /= self.simrate
+            self.r_foot_orient_cost      /= self.simrate
+
+        height = self.sim.qpos(copy=False)[2]
         self.curr_action = action
 
         self.time  += 1
@@ -437,17 +471,7 @@ class CassieEnv_v2:
             self.phase = 0
             self.counter += 1
 
-        # no more knee walking
-        if self.sim.xpos("left-tarsus")[2] < 0.1 or self.sim.xpos("right-tarsus")[2] < 0.1:
-            done = True
-            # print("left tarsus: {:.2f}\tleft foot: {:.2f}".format(self.sim.xpos("left-tarsus")[2], self.sim.xpos("left-foot")[2]))
-            # print("right tarsus: {:.2f}\tright foot: {:.2f}".format(self.sim.xpos("right-tarsus")[2], self.sim.xpos("right-foot")[2]))
-            # while(1):
-            #     self.vis.draw(self.sim)
-        elif height < 0.4 or height > 3.0:
-            done = True
-        else:
-            done = False
+        done = self.check_termination(height)
 
         reward = self.compute_reward(action)
 
@@ -463,6 +487,23 @@ class CassieEnv_v2:
         else:
             return self.get_full_state(), reward, done, {}
 
+    def check_termination(self, height):
+        # no more knee walking
+        if self.sim.xpos_id(self.body_ids["left-tarsus"], copy=False)[2] < 0.1 or self.sim.xpos_id(self.body_ids["right-tarsus"], copy=False)[2] < 0.1:
+            # print("left tarsus: {:.2f}\tleft foot: {:.2f}".format(self.sim.xpos("left-tarsus")[2], self.sim.xpos("left-foot")[2]))
+            # print("right tarsus: {:.2f}\tright foot: {:.2f}".format(self.sim.xpos("right-tarsus")[2], self.sim.xpos("right-foot")[2]))
+            # while(1):
+            #     self.vis.draw(self.sim)
+            return True
+        return bool(height < 0.4 or height > 3.0)
+
+    # Accumulated time and call count per step section, empty unless step timing is on
+    def perf_stats(self):
+        return self.step_timer.stats()
+
+    def reset_perf_stats(self):
+        self.step_timer.reset()
+
     def reset(self):
 
         if self.aslip_traj:
@@ -499,7 +540,7 @@ class CassieEnv_v2:
         self.time = 0
         self.counter = 0
 
-        self.state_history = [np.zeros(self._obs) for _ in range(self.history+1)]
+        self.state_history.reset()
 
         qpos, qvel = self.get_ref_state(self.phase)
         # orientation = random.randint(-10, 10) * np.pi / 25
@@ -517,7 +558,7 @@ class CassieEnv_v2:
         self.last_pelvis_pos = self.sim.qpos()[0:3]
 
         # Need to reset u? Or better way to reset cassie_state than taking step
-        self.cassie_state = self.sim.step_pd(self.u)
+        self.sim.step_pd(self.u, out=self.cassie_state)
 
         self.orient_add = 0#random.randint(-10, 10) * np.pi / 25
         self.orient_time = 0#random.randint(50, 200) 
@@ -545,13 +586,13 @@ class CassieEnv_v2:
             # self.sim.set_dof_damping(np.clip(damp_noise, 0, None))
             # self.sim.set_body_mass(np.clip(mass_noise, 0, None))
             # self.sim.set_body_ipos(com_noise)
-            self.sim.set_geom_friction(np.clip(fric_noise, 0, None), "floor")
+            self.sim.set_geom_friction_id(np.clip(fric_noise, 0, None), self.floor_id)
             self.sim.set_const()
 
         if self.slope_rand:
             rand_angle = np.pi/180*np.random.uniform(-5, 5, 2)
             floor_quat = euler2quat(z=0, y=rand_angle[0], x=rand_angle[1])
-            self.sim.set_geom_quat(floor_quat, "floor")
+            self.sim.set_geom_quat_id(floor_quat, self.floor_id)
         if self.joint_rand:
             self.joint_offsets = np.random.uniform(-0.03, 0.03, 16)
             # Set motor and joint foot to be same offset
@@ -570,7 +611,7 @@ class CassieEnv_v2:
         self.y_offset = 0
         self.phase_add = 1
 
-        self.state_history = [np.zeros(self._obs) for _ in range(self.history+1)]
+        self.state_history.reset()
 
         if self.aslip_traj:
             self.traj_idx = 0
@@ -598,7 +639,7 @@ class CassieEnv_v2:
             self.r_foot_orient = 0
 
             # Need to reset u? Or better way to reset cassie_state than taking step
-            self.cassie_state = self.sim.step_pd(self.u)
+            self.sim.step_pd(self.u, out=self.cassie_state)
         else:
             self.sim.full_reset()
             self.reset_cassie_state()
@@ -611,7 +652,7 @@ class CassieEnv_v2:
             self.sim.set_const()
 
         if self.slope_rand:
-            self.sim.set_geom_quat(np.array([1, 0, 0, 0]), "floor")
+            self.sim.set_geom_quat_id(np.array([1, 0, 0, 0]), self.floor_id)
 
         return self.get_full_state()
 
@@ -628,6 +669,41 @@ class CassieEnv_v2:
         self.cassie_state.joint.position[:] = [0, 1.4267, -1.5968, 0, 1.4267, -1.5968]
         self.cassie_state.joint.velocity[:] = np.zeros(6)
 
+    # Rollout state on top of the sim itself that save_state/load_state carry.
+    # The first group is copied, the second is shared by reference (trajectory
+    # data and clock functions are never modified during a rollout).
+    _saved_attrs = ["phase", "counter", "speed", "simsteps", "time", "phase_add", "orient_add", "orient_time",
+                    "y_offset", "com_vel_offset", "offset", "joint_offsets", "last_pelvis_pos", "prev_action",
+                    "curr_action", "prev_torque", "state_history", "stepcount", "l_high", "r_high", "l_swing",
+                    "r_swing", "l_foot_frc", "r_foot_frc", "l_foot_pos", "r_foot_pos", "l_foot_vel", "r_foot_vel",
+                    "l_foot_orient_cost", "r_foot_orient_cost"]
+    _shared_attrs = ["traj_idx", "trajectory", "phaselen", "left_clock", "right_clock"]
+
+    # Snapshot of the full env state, to be passed back to load_state. Model
+    # parameters set by dynamics/slope randomization are not included.
+    def save_state(self):
+        state = {"sim": self.sim.snapshot(),
+                 "cassie_state": state_out_t.from_buffer_copy(self.cassie_state),
+                 "u": pd_in_t.from_buffer_copy(self.u)}
+        for name in self._saved_attrs:
+            if hasattr(self, name):
+                state[name] = copy.deepcopy(getattr(self, name))
+        for name in self._shared_attrs:
+            if hasattr(self, name):
+                state[name] = getattr(self, name)
+        return state
+
+    def load_state(self, state):
+        self.sim.restore(state["sim"])
+        self.state_view.load(state["cassie_state"])
+        self.pd_cmd.load(state["u"])
+        for name in self._saved_attrs:
+            if name in state:
+                setattr(self, name, copy.deepcopy(state[name]))
+        for name in self._shared_attrs:
+            if name in state:
+                setattr(self, name, state[name])
+
     # Helper function for updating the speed, used in visualization tests
     # not needed in training cause we don't change speeds in middle of rollout, and 
     # we randomize the starting phase of each rollout
@@ -655,80 +731,33 @@ class CassieEnv_v2:
             self.right_clock = self.reward_clock_funcs["right"][self.traj_idx]
 
     def compute_reward(self, action):
-        qpos = np.copy(self.sim.qpos())
-        qvel = np.copy(self.sim.qvel())
-
-        ref_pos, ref_vel = self.get_ref_state(self.phase)
-        if self.reward_func == "clock":
-            self.early_term_cutoff = 0.2
-            return clock_reward(self, action)
-        elif self.reward_func == "max_vel_clock":
-            self.early_term_cutoff = 0.2
-            return max_vel_clock_reward(self, action)
-        elif self.reward_func == "aslip_clock":
-            self.early_term_cutoff = 0.2
-            return aslip_clock_reward(self, action)
-        elif self.reward_func == "aslip_old":
-            self.early_term_cutoff = 0.0
-            return aslip_old_reward(self, action)      
-        elif self.reward_func == "iros_paper":
-            return iros_paper_reward(self)
-        elif self.reward_func == "5k_speed_reward":
-            return old_speed_reward(self)
-        else:
-            raise NotImplementedError
+        # the plain reward functions print a breakdown of the terms in debug mode
+        if self.debug:
+            return self._reward_ref(self, action)
+        snap = self.reward_snapshot
+        snap.update(self)
+        return self._reward_kernel(self, snap, action)
 
   # get the corresponding state from the reference trajectory for the current phase
+    # reference lookup table for the current trajectory, shared between envs
+    def ref_table(self):
+        table = self._ref_tables.get(id(self.trajectory))
+        if table is None:
+            table = get_ref_table(self.trajectory, self.simrate, self.aslip_traj, self.pos_idx, self.pos_index, self.vel_index)
+            self._ref_tables[id(self.trajectory)] = table
+        return table
+
+    # Reference qpos and qvel at the given phase. The pelvis x target is moved
+    # forward by speed and the number of completed cycles, and the lateral
+    # target is always 0, regardless of reference trajectory.
     def get_ref_state(self, phase=None):
         if phase is None:
             phase = self.phase
-
-        if phase > self.phaselen:
-            phase = 0
-
-        desired_ind = phase * self.simrate if not self.aslip_traj else phase
-        # phase_diff = desired_ind - math.floor(desired_ind)
-        # if phase_diff != 0:       # desired ind is an int
-        #     pos_prev = np.copy(self.trajectory.qpos[math.floor(desired_ind)])
-        #     vel_prev = np.copy(self.trajectory.qvel[math.floor(desired_ind)])
-        #     pos_next = np.copy(self.trajectory.qpos[math.ceil(desired_ind)])
-        #     vel_next = np.copy(self.trajectory.qvel[math.ceil(desired_ind)])
-        #     pos = pos_prev + phase_diff * (pos_next - pos_prev)
-        #     vel = vel_prev + phase_diff * (vel_next - vel_prev)
-        # else:
-        # print("desired ind: ", desired_ind)
-        pos = np.copy(self.trajectory.qpos[int(desired_ind)])
-        vel = np.copy(self.trajectory.qvel[int(desired_ind)])
-
-        # this is just setting the x to where it "should" be given the number
-        # of cycles
-        # pos[0] += (self.trajectory.qpos[-1, 0] - self.trajectory.qpos[0, 0]) * self.counter
-        
-        # ^ should only matter for COM error calculation,
-        # gets dropped out of state variable for input reasons
-
-        ###### Setting variable speed  #########
-        if not self.aslip_traj:
-            pos[0] *= self.speed
-            pos[0] += (self.trajectory.qpos[-1, 0] - self.trajectory.qpos[0, 0]) * self.counter * self.speed
-        else:
-            pos[0] += (self.trajectory.qpos[-1, 0] - self.trajectory.qpos[0, 0]) * self.counter
-        ######                          ########
-
-        # setting lateral distance target to 0?
-        # regardless of reference trajectory?
-        pos[1] = 0
-
-        if not self.aslip_traj:
-            vel[0] *= self.speed
-
-        return pos, vel
+        return self.ref_table().state(phase, self.speed, self.counter)
 
     def get_full_state(self):
-        qpos = np.copy(self.sim.qpos())
-        qvel = np.copy(self.sim.qvel()) 
-
-        ref_pos, ref_vel = self.get_ref_state(self.phase + self.phase_add)
+        qpos = self.sim.qpos(copy=False)
+        qvel = self.sim.qvel(copy=False)
 
         # TODO: maybe convert to set subtraction for clarity
         # {i for i in range(35)} - 
@@ -761,51 +790,35 @@ class CassieEnv_v2:
 
         # OTHER TRAJECTORY
         else:
-            ext_state = np.concatenate([ref_pos[self.pos_index], ref_vel[self.vel_index]])
+            ext_state = self.ref_table().ext_state(self.phase + self.phase_add, self.speed)
 
         # Update orientation
-        new_orient = self.cassie_state.pelvis.orientation[:]
-        new_translationalVelocity = self.cassie_state.pelvis.translationalVelocity[:]
-        new_translationalAcceleleration = self.cassie_state.pelvis.translationalAcceleration[:]
-        # new_translationalVelocity[0:2] += self.com_vel_offset
+        # Use state estimator, with the orientation and velocities rotated in place
+        sv = self.state_view
         quaternion = euler2quat(z=self.orient_add, y=0, x=0)
         iquaternion = inverse_quaternion(quaternion)
-        new_orient = quaternion_product(iquaternion, self.cassie_state.pelvis.orientation[:])
-        if new_orient[0] < 0:
-            new_orient = -new_orient
-        new_translationalVelocity = rotate_by_quaternion(self.cassie_state.pelvis.translationalVelocity[:], iquaternion)
-        new_translationalAcceleleration = rotate_by_quaternion(self.cassie_state.pelvis.translationalAcceleration[:], iquaternion)
-        motor_pos = self.cassie_state.motor.position[:]
-        joint_pos = self.cassie_state.joint.position[:]
+        robot_state = sv.buf[self.robot_state_idx]
+        robot_state[0] -= sv["terrain.height"][0]           # pelvis height
+        quaternion_product(iquaternion, sv["pelvis.orientation"], out=robot_state[1:5])  # pelvis orientation
+        if robot_state[1] < 0:
+            robot_state[1:5] *= -1
+                                                            # [5:15] actuated joint positions
+        rotate_by_quaternion(sv["pelvis.translationalVelocity"], iquaternion, out=robot_state[15:18])  # pelvis translational velocity
+                                                            # [18:21] pelvis rotational velocity
+                                                            # [21:31] actuated joint velocities
+        rotate_by_quaternion(sv["pelvis.translationalAcceleration"], iquaternion, out=robot_state[31:34])  # pelvis translational acceleration
+                                                            # [34:40] unactuated joint positions
+                                                            # [40:46] unactuated joint velocities
         if self.joint_rand:
-            motor_pos += self.joint_offsets[0:10]
-            joint_pos += self.joint_offsets[10:16]
-
-        # Use state estimator
-        robot_state = np.concatenate([
-            [self.cassie_state.pelvis.position[2] - self.cassie_state.terrain.height], # pelvis height
-            new_orient,                                 # pelvis orientation
-            motor_pos,                                     # actuated joint positions
-
-            new_translationalVelocity,                       # pelvis translational velocity
-            self.cassie_state.pelvis.rotationalVelocity[:],                          # pelvis rotational velocity 
-            self.cassie_state.motor.velocity[:],                                     # actuated joint velocities
-
-            new_translationalAcceleleration,                   # pelvis translational acceleration
-            
-            joint_pos,                                     # unactuated joint positions
-            self.cassie_state.joint.velocity[:]                                      # unactuated joint velocities
-        ])
+            robot_state[5:15] += self.joint_offsets[0:10]
+            robot_state[34:40] += self.joint_offsets[10:16]
 
         if self.state_est:
             state = np.concatenate([robot_state, ext_state])
         else:
             state = np.concatenate([qpos[self.pos_index], qvel[self.vel_index], ext_state])
 
-        self.state_history.insert(0, state)
-        self.state_history = self.state_history[:self.history+1]
-
-        return np.concatenate(self.state_history)
+        return self.state_history.push(state)
 
     def render(self):
         if self.vis is None:
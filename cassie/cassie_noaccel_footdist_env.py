@@ -5,6 +5,8 @@ from .cassiemujoco import pd_in_t, state_out_t, CassieSim, CassieVis
 from .trajectory import CassieTrajectory, getAllTrajectories
 from cassie.quaternion_function import *
 from .rewards import *
+from .obs_history import ObsHistory
+from .step_timer import StepTimer, step_timing_enabled
 
 from math import floor
 
@@ -16,7 +18,10 @@ import copy
 import pickle
 
 class CassieEnv_noaccel_footdist:
-    def __init__(self, traj='walking', simrate=60, clock_based=True, state_est=True, dynamics_randomization=True, no_delta=True, reward="iros_paper", history=0):
+    # methods timed when step timing is on, and the section they count towards
+    timed_sections = {"step": "step", "step_simulation": "simulation", "compute_reward": "reward", "get_full_state": "observation"}
+
+    def __init__(self, traj='walking', simrate=60, clock_based=True, state_est=True, dynamics_randomization=True, no_delta=True, reward="iros_paper", history=0, step_timing=False):
         self.sim = CassieSim("./cassie/cassiemujoco/cassie.xml")
         self.vis = None
 
@@ -50,7 +55,7 @@ class CassieEnv_noaccel_footdist:
         # Adds option for state history for FF nets
         self._obs = len(self.observation_space)
         self.history = history
-        self.state_history = [np.zeros(self._obs) for _ in range(self.history+1)]
+        self.state_history = ObsHistory(self._obs, self.history)
 
         self.observation_space = np.zeros(self._obs + self._obs * self.history)
         self.action_space = np.zeros(10)
@@ -209,6 +214,11 @@ class CassieEnv_noaccel_footdist:
 
         self.debug = False
 
+        # optional per-section timing of step(), see step_timer.py
+        self.step_timer = StepTimer()
+        if step_timing_enabled(step_timing):
+            self.step_timer.instrument(self, self.timed_sections)
+
     def set_up_state_space(self):
 
         mjstate_size   = 40
@@ -456,13 +466,20 @@ class CassieEnv_noaccel_footdist:
         else:
             return self.get_full_state(), reward, done, {}
 
+    # Accumulated time and call count per step section, empty unless step timing is on
+    def perf_stats(self):
+        return self.step_timer.stats()
+
+    def reset_perf_stats(self):
+        self.step_timer.reset()
+
     def reset(self):
 
         self.phase = random.randint(0, self.phaselen)
         self.time = 0
         self.counter = 0
 
-        self.state_history = [np.zeros(self._obs) for _ in range(self.history+1)]
+        self.state_history.reset()
 
         qpos, qvel = self.get_ref_state(self.phase)
         orientation = random.randint(-10, 10) * np.pi / 25
@@ -544,7 +561,7 @@ class CassieEnv_noaccel_footdist:
         self.y_offset = 0
         self.phase_add = 1
 
-        self.state_history = [np.zeros(self._obs) for _ in range(self.history+1)]
+        self.state_history.reset()
 
         if self.aslip_traj:
             self.speed = 0
@@ -622,8 +639,8 @@ class CassieEnv_noaccel_footdist:
             self.speed = new_speed
 
     def compute_reward(self, action):
-        qpos = np.copy(self.sim.qpos())
-        qvel = np.copy(self.sim.qvel())
+        qpos = self.sim.qpos()
+        qvel = self.sim.qvel()
 
         ref_pos, ref_vel = self.get_ref_state(self.phase)
 
@@ -708,8 +725,8 @@ class CassieEnv_noaccel_footdist:
         return pos, vel
 
     def get_full_state(self):
-        qpos = np.copy(self.sim.qpos())
-        qvel = np.copy(self.sim.qvel()) 
+        qpos = self.sim.qpos()
+        qvel = self.sim.qvel() 
 
         ref_pos, ref_vel = self.get_ref_state(self.phase + self.phase_add)
 
@@ -782,10 +799,7 @@ class CassieEnv_noaccel_footdist:
         else:
             state = np.concatenate([qpos[self.pos_index], qvel[self.vel_index], ext_state])
 
-        self.state_history.insert(0, state)
-        self.state_history = self.state_history[:self.history+1]
-
-        return np.concatenate(self.state_history)
+        return self.state_history.push(state)
 
     def render(self):
         if self.vis is None:
@@ -1,6 +1,7 @@
 from .cassiemujoco import pd_in_t, state_out_t, CassieSim, CassieVis
 
 from .trajectory import CassieTrajectory
+from .step_timer import StepTimer, step_timing_enabled
 
 from math import floor
 
@@ -12,8 +13,10 @@ import pickle
 
 # Creating the Standing Environment
 class CassieStandingEnv:
+    # methods timed when step timing is on, and the section they count towards
+    timed_sections = {"step": "step", "step_simulation": "simulation", "compute_reward": "reward", "get_full_state": "observation"}
 
-    def __init__(self, traj="stepping", simrate=60, state_est=True):
+    def __init__(self, traj="stepping", simrate=60, state_est=True, step_timing=False):
 
         # Using CassieSim
         self.sim = CassieSim('./cassie/cassiemujoco/cassie.xml')
@@ -38,8 +41,8 @@ class CassieStandingEnv:
         
         self.trajectory = CassieTrajectory(traj_path)
         
-        self.init_qpos = np.copy(self.sim.qpos())
-        self.init_qvel = np.copy(self.sim.qvel())
+        self.init_qpos = self.sim.qpos()
+        self.init_qvel = self.sim.qvel()
 
         self.goal_qpos = 0
 
@@ -63,6 +66,11 @@ class CassieStandingEnv:
         self.pos_idx = [7, 8, 9, 14, 20, 21, 22, 23, 28, 34]
         self.vel_idx = [6, 7, 8, 12, 18, 19, 20, 21, 25, 31]
 
+        # optional per-section timing of step(), see step_timer.py
+        self.step_timer = StepTimer()
+        if step_timing_enabled(step_timing):
+            self.step_timer.instrument(self, self.timed_sections)
+
     @property
     def dt(self):
         return 1 / 2000 * self.simrate
@@ -126,6 +134,13 @@ class CassieStandingEnv:
         
         return state, reward, done, {}
 
+    # Accumulated time and call count per step section, empty unless step timing is on
+    def perf_stats(self):
+        return self.step_timer.stats()
+
+    def reset_perf_stats(self):
+        self.step_timer.reset()
+
     def reset(self):
         self.phase = random.randint(0, self.phaselen)
         qpos0, qvel0 = self.get_ref_state(self.phase)
@@ -140,8 +155,8 @@ class CassieStandingEnv:
 
 
     def compute_reward(self):
-        qpos = np.copy(self.sim.qpos())
-        qvel = np.copy(self.sim.qvel())
+        qpos = self.sim.qpos()
+        qvel = self.sim.qvel()
         left_foot_pos = self.cassie_state.leftFoot.position[:]
         right_foot_pos = self.cassie_state.rightFoot.position[:]
         foot_pos = np.concatenate([left_foot_pos, right_foot_pos])
@@ -210,8 +225,8 @@ class CassieStandingEnv:
         return pos, vel
 
     def get_full_state(self):
-        qpos = np.copy(self.sim.qpos())
-        qvel = np.copy(self.sim.qvel()) 
+        qpos = self.sim.qpos()
+        qvel = self.sim.qvel() 
 
         # TODO: maybe convert to set subtraction for clarity
         # {i for i in range(35)} - 
@@ -16,40 +16,166 @@ from .cassiemujoco_ctypes import *
 import os
 import ctypes
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 
 # Get base directory
 _dir_path = os.path.dirname(os.path.realpath(__file__))
 
-# Initialize libcassiesim
-# cassie_mujoco_init(str.encode(_dir_path+"/cassie_noise_terrain.xml"))
-cassie_mujoco_init(str.encode(_dir_path+"/cassie.xml"))
-# cassie_mujoco_init(str.encode("../model/cassie.xml"))
+# Initialize libcassiesim. This is done when the first CassieSim is made rather
+# than at import, so importing the module stays cheap.
+_mujoco_initialized = False
+
+def _init_mujoco():
+    global _mujoco_initialized
+    if not _mujoco_initialized:
+        # cassie_mujoco_init(str.encode(_dir_path+"/cassie_noise_terrain.xml"))
+        cassie_mujoco_init(str.encode(_dir_path+"/cassie.xml"))
+        # cassie_mujoco_init(str.encode("../model/cassie.xml"))
+        _mujoco_initialized = True
+
+# Untouched sims for each model file that has been loaded, so that new sims are
+# made with cassie_sim_duplicate instead of parsing and compiling the XML again.
+# These live for the whole process and are never stepped.
+_model_cache = {}
+# Model file the library currently has loaded. Without reinit, cassie_sim_init
+# ignores its modelfile argument and copies this model instead.
+_loaded_model = os.path.realpath(_dir_path+"/cassie.xml")
+
+
+# Helpers for moving whole parameter arrays in and out of the sim in one copy
+# instead of element by element.
+def _as_c_buffer(data, size, name, dtype=np.float64):
+    # No copy is made if data is already a contiguous array of the right dtype
+    arr = np.ascontiguousarray(data, dtype=dtype).reshape(-1)
+    if arr.size != size:
+        raise ValueError("{}: expected {} values, got {}".format(name, size, arr.size))
+    return arr
+
+def _double_ptr(arr):
+    return arr.ctypes.data_as(ctypes.POINTER(ctypes.c_double))
+
+def _copy_from_ptr(ptr, size):
+    return np.array(np.ctypeslib.as_array(ptr, shape=(size,)), dtype=np.float64)
 
 
 # Interface classes
 class CassieSim:
     def __init__(self, modelfile, reinit=False):
-        self.c = cassie_sim_init(modelfile.encode('utf-8'), reinit)
+        global _loaded_model
+        _init_mujoco()
+        if reinit:
+            _loaded_model = os.path.realpath(modelfile)
+        proto = _model_cache.get(_loaded_model)
+        if proto is None:
+            self.c = cassie_sim_init(modelfile.encode('utf-8'), reinit)
+            _model_cache[_loaded_model] = cassie_sim_duplicate(self.c)
+        else:
+            self.c = cassie_sim_duplicate(proto)
+        self._init_buffers()
+
+    def _init_buffers(self):
         self.nv = 32
         self.nbody = 26
         self.nq = 35
         self.ngeom = 35
 
+        # NumPy views over the simulator's own state buffers. These alias memory
+        # owned by the sim, so they are valid for as long as the sim is alive.
+        self._qpos = np.ctypeslib.as_array(cassie_sim_qpos(self.c), shape=(self.nq,))
+        self._qvel = np.ctypeslib.as_array(cassie_sim_qvel(self.c), shape=(self.nv,))
+        self._qacc = np.ctypeslib.as_array(cassie_sim_qacc(self.c), shape=(self.nv,))
+        self._body_xpos = np.ctypeslib.as_array(cassie_sim_xpos(self.c, b"world"), shape=(self.nbody, 3))
+        self._body_xquat = np.ctypeslib.as_array(cassie_sim_xquat(self.c, b"world"), shape=(self.nbody, 4))
+        # model geom parameters, written in place by the *_id setters
+        self._geom_friction = np.ctypeslib.as_array(cassie_sim_geom_friction(self.c), shape=(self.ngeom, 3))
+        self._geom_quat = np.ctypeslib.as_array(cassie_sim_geom_quat(self.c), shape=(self.ngeom, 4))
+        self._body_ids = {}
+        self._body_names = {}
+        self._geom_ids = {}
+
+        # Reusable buffers for the foot queries, with NumPy views over them
+        self._foot_frc_buf = (ctypes.c_double * 12)()
+        self._foot_pos_buf = (ctypes.c_double * 6)()
+        self._foot_vel_buf = (ctypes.c_double * 12)()
+        self._foot_frc = np.ctypeslib.as_array(self._foot_frc_buf)
+        self._foot_pos = np.ctypeslib.as_array(self._foot_pos_buf)
+        self._foot_vel = np.ctypeslib.as_array(self._foot_vel_buf)
+
     def step(self, u):
         y = cassie_out_t()
         cassie_sim_step(self.c, y, u)
         return y
 
-    def step_pd(self, u):
-        y = state_out_t()
+    def step_pd(self, u, out=None):
+        y = state_out_t() if out is None else out
         cassie_sim_step_pd(self.c, y, u)
         return y
 
+    # Run n PD substeps with the same input u and return the last state_out_t
+    # (written into out if it is given).
+    # If a StepAccumulators is given, the foot forces, positions and
+    # orientations are recorded after every substep and reduced once at the
+    # end, so the per-substep work is only the ctypes calls and buffer copies.
+    def step_pd_n(self, u, n, accumulators=None, out=None):
+        y = state_out_t() if out is None else out
+        c = self.c
+        if accumulators is None:
+            for _ in range(n):
+                cassie_sim_step_pd(c, y, u)
+            return y
+
+        acc = accumulators
+        if acc.n != n:
+            raise ValueError("step_pd_n: accumulators sized for {} substeps, got {}".format(acc.n, n))
+
+        frc_buf, pos_buf = self._foot_frc_buf, self._foot_pos_buf
+        frc, pos = self._foot_frc, self._foot_pos
+        l_quat = self.xquat_id(self.body_id("left-foot"), copy=False)
+        r_quat = self.xquat_id(self.body_id("right-foot"), copy=False)
+        frc_trace, pos_trace, quat_trace = acc.frc_trace, acc.pos_trace, acc.quat_trace
+
+        cassie_sim_foot_positions(c, pos_buf)
+        pos_trace[0] = pos
+        for i in range(n):
+            cassie_sim_step_pd(c, y, u)
+            cassie_sim_foot_forces(c, frc_buf)
+            cassie_sim_foot_positions(c, pos_buf)
+            frc_trace[i] = frc[2::6]
+            pos_trace[i + 1] = pos
+            quat_trace[i, 0] = l_quat
+            quat_trace[i, 1] = r_quat
+
+        acc.reduce()
+        return y
+
     def get_state(self):
         s = CassieState()
         cassie_get_state(self.c, s.s)
         return s
 
+    # Independent copy of this sim, including its current state
+    def clone(self):
+        sim = CassieSim.__new__(CassieSim)
+        sim.c = cassie_sim_duplicate(self.c)
+        sim._init_buffers()
+        sim._body_ids = dict(self._body_ids)
+        sim._body_names = dict(self._body_names)
+        sim._geom_ids = dict(self._geom_ids)
+        return sim
+
+    # Full copy of the simulator (mujoco data, PD and estimator internals) as a
+    # standalone CassieSim. Pass it to restore() to rewind this sim to it; the
+    # snapshot itself is left untouched, so it can be restored any number of times.
+    def snapshot(self):
+        return self.clone()
+
+    def restore(self, snap):
+        cassie_sim_copy(self.c, snap.c)
+        # Rebuild the views in case the copy moved any of the sim's buffers
+        body_ids, body_names, geom_ids = self._body_ids, self._body_names, self._geom_ids
+        self._init_buffers()
+        self._body_ids, self._body_names, self._geom_ids = body_ids, body_names, geom_ids
+
     def set_state(self, s):
         cassie_set_state(self.c, s.s)
 
@@ -57,41 +183,76 @@ class CassieSim:
         timep = cassie_sim_time(self.c)
         return timep[0]
 
-    def qpos(self):
-        qposp = cassie_sim_qpos(self.c)
-        return qposp[:35]
-
-    def qvel(self):
-        qvelp = cassie_sim_qvel(self.c)
-        return qvelp[:32]
-
-    def qacc(self):
-        qaccp = cassie_sim_qacc(self.c)
-        return qaccp[:32]
-
-    def xpos(self, body_name):
-        # print("in xquat")
-        xposp = cassie_sim_xpos(self.c, body_name.encode())
-        # print("got pointer")
-        return xposp[:3]
-
-    def xquat(self, body_name):
-        xquatp = cassie_sim_xquat(self.c, body_name.encode())
-        return xquatp[:4]
+    # The state accessors below return a fresh array by default. Passing
+    # copy=False returns a live view into the sim instead, which is much cheaper
+    # but will change underneath the caller on the next step, so only use it for
+    # values that are read immediately.
+    def qpos(self, copy=True):
+        return self._qpos.copy() if copy else self._qpos
+
+    def qvel(self, copy=True):
+        return self._qvel.copy() if copy else self._qvel
+
+    def qacc(self, copy=True):
+        return self._qacc.copy() if copy else self._qacc
+
+    def xpos(self, body_name, copy=True):
+        return self.xpos_id(self.body_id(body_name), copy)
+
+    def xquat(self, body_name, copy=True):
+        return self.xquat_id(self.body_id(body_name), copy)
+
+    # Bodies and geoms can be looked up by name once and then accessed by
+    # integer id, which skips the string encoding and name search on every call.
+    def body_id(self, name):
+        bid = self._body_ids.get(name)
+        if bid is None:
+            xposp = cassie_sim_xpos(self.c, name.encode())
+            # mjData xpos is an nbody x 3 array, so the offset from the world
+            # body gives the id
+            bid = -1
+            if xposp:
+                bid = (ctypes.addressof(xposp.contents) - self._body_xpos.ctypes.data) // (3 * 8)
+            if bid < 0 or bid >= self.nbody:
+                raise ValueError("body_id: no body named {}".format(name))
+            self._body_ids[name] = bid
+            self._body_names[bid] = name.encode()
+        return bid
+
+    def geom_id(self, name):
+        gid = self._geom_ids.get(name)
+        if gid is None:
+            # The library has no geom name lookup, so mark the geom's friction
+            # through the named setter, find the marked row, then put the
+            # original values back
+            fric = self.get_geom_friction()
+            self.set_geom_friction([-1, -1, -1], name)
+            rows = np.flatnonzero((self.get_geom_friction().reshape(-1, 3) == -1).all(axis=1))
+            self.set_geom_friction(fric)
+            if len(rows) != 1:
+                raise ValueError("geom_id: no geom named {}".format(name))
+            gid = self._geom_ids[name] = int(rows[0])
+        return gid
+
+    def xpos_id(self, body_id, copy=True):
+        view = self._body_xpos[body_id]
+        return view.copy() if copy else view
+
+    def xquat_id(self, body_id, copy=True):
+        view = self._body_xquat[body_id]
+        return view.copy() if copy else view
 
     def set_time(self, time):
         timep = cassie_sim_time(self.c)
         timep[0] = time
 
     def set_qpos(self, qpos):
-        qposp = cassie_sim_qpos(self.c)
-        for i in range(min(len(qpos), 35)):
-            qposp[i] = qpos[i]
+        n = min(len(qpos), self.nq)
+        self._qpos[:n] = qpos[:n]
 
     def set_qvel(self, qvel):
-        qvelp = cassie_sim_qvel(self.c)
-        for i in range(min(len(qvel), 32)):
-            qvelp[i] = qvel[i]
+        n = min(len(qvel), self.nv)
+        self._qvel[:n] = qvel[:n]
 
     # def set_cassie_state(self, copy_state):
     #     cassie_sim_set_cassiestate(self.c, copy_state)
@@ -106,172 +267,92 @@ class CassieSim:
         cassie_sim_release(self.c)
 
     def apply_force(self, xfrc, body_name="cassie-pelvis"):
-        xfrc_array = (ctypes.c_double * 6)()
-        for i in range(len(xfrc)):
-            xfrc_array[i] = xfrc[i]
-        cassie_sim_apply_force(self.c, xfrc_array, body_name.encode())
+        xfrc_array = np.zeros(6)
+        xfrc_array[:len(xfrc)] = xfrc
+        cassie_sim_apply_force(self.c, _double_ptr(xfrc_array), body_name.encode())
+
+    # The library only applies forces by body name, so this still runs its
+    # name search on every call; it only saves encoding the name.
+    def apply_force_id(self, xfrc, body_id):
+        xfrc_array = np.zeros(6)
+        xfrc_array[:len(xfrc)] = xfrc
+        cassie_sim_apply_force(self.c, _double_ptr(xfrc_array), self._body_names[body_id])
 
     def foot_force(self, force):
-        frc_array = (ctypes.c_double * 12)()
-        cassie_sim_foot_forces(self.c, frc_array)
-        for i in range(12):
-            force[i] = frc_array[i]
+        cassie_sim_foot_forces(self.c, self._foot_frc_buf)
+        force[:12] = self._foot_frc
 
     def foot_pos(self, pos):
-        pos_array = (ctypes.c_double * 6)()
-        cassie_sim_foot_positions(self.c, pos_array)
-        for i in range(6):
-            pos[i] = pos_array[i]
+        cassie_sim_foot_positions(self.c, self._foot_pos_buf)
+        pos[:6] = self._foot_pos
 
     def foot_vel(self, vel):
-        vel_array = (ctypes.c_double * 12)()
-        cassie_sim_foot_velocities(self.c, vel_array)
-        for i in range(12):
-            vel[i] = vel_array[i]
+        cassie_sim_foot_velocities(self.c, self._foot_vel_buf)
+        vel[:12] = self._foot_vel
 
     def clear_forces(self):
         cassie_sim_clear_forces(self.c)
 
     def get_foot_forces(self):
-        y = state_out_t()
-        force = np.zeros(12)
-        self.foot_force(force)
-        return force[[2, 8]]
+        cassie_sim_foot_forces(self.c, self._foot_frc_buf)
+        return self._foot_frc[[2, 8]]
 
     def get_dof_damping(self):
-        ptr = cassie_sim_dof_damping(self.c)
-        ret = np.zeros(self.nv)
-        for i in range(self.nv):
-          ret[i] = ptr[i]
-        return ret
-    
+        return _copy_from_ptr(cassie_sim_dof_damping(self.c), self.nv)
+
     def get_body_mass(self):
-        ptr = cassie_sim_body_mass(self.c)
-        ret = np.zeros(self.nbody)
-        for i in range(self.nbody):
-          ret[i] = ptr[i]
-        return ret
+        return _copy_from_ptr(cassie_sim_body_mass(self.c), self.nbody)
 
     def get_body_ipos(self):
-        nbody = self.nbody * 3
-        ptr = cassie_sim_body_ipos(self.c)
-        ret = np.zeros(nbody)
-        for i in range(nbody):
-          ret[i] = ptr[i]
-        return ret
+        return _copy_from_ptr(cassie_sim_body_ipos(self.c), self.nbody * 3)
 
     def get_geom_friction(self):
-        ptr = cassie_sim_geom_friction(self.c)
-        ret = np.zeros(self.ngeom * 3)
-        for i in range(self.ngeom * 3):
-          ret[i] = ptr[i]
-        return ret
+        return _copy_from_ptr(cassie_sim_geom_friction(self.c), self.ngeom * 3)
 
     def get_geom_rgba(self):
-        ptr = cassie_sim_geom_rgba(self.c)
-        ret = np.zeros(self.ngeom * 4)
-        for i in range(self.ngeom * 4):
-          ret[i] = ptr[i]
-        return ret
+        return _copy_from_ptr(cassie_sim_geom_rgba(self.c), self.ngeom * 4)
 
     def get_geom_quat(self):
-        ptr = cassie_sim_geom_quat(self.c)
-        ret = np.zeros(self.ngeom * 4)
-        for i in range(self.ngeom * 4):
-          ret[i] = ptr[i]
-        return ret
+        return _copy_from_ptr(cassie_sim_geom_quat(self.c), self.ngeom * 4)
 
     def set_dof_damping(self, data):
-        c_arr = (ctypes.c_double * self.nv)()
-
-        if len(data) != self.nv:
-          print("SIZE MISMATCH SET_DOF_DAMPING()")
-          exit(1)
-        
-        for i in range(self.nv):
-          c_arr[i] = data[i]
-
-        cassie_sim_set_dof_damping(self.c, c_arr)
+        c_arr = _as_c_buffer(data, self.nv, "set_dof_damping")
+        cassie_sim_set_dof_damping(self.c, _double_ptr(c_arr))
 
     def set_body_mass(self, data):
-        c_arr = (ctypes.c_double * self.nbody)()
-
-        if len(data) != self.nbody:
-          print("SIZE MISMATCH SET_BODY_MASS()")
-          exit(1)
-        
-        for i in range(self.nbody):
-          c_arr[i] = data[i]
-
-        cassie_sim_set_body_mass(self.c, c_arr)
+        c_arr = _as_c_buffer(data, self.nbody, "set_body_mass")
+        cassie_sim_set_body_mass(self.c, _double_ptr(c_arr))
 
     def set_body_ipos(self, data):
-        nbody = self.nbody * 3
-        c_arr = (ctypes.c_double * nbody)()
-
-        if len(data) != nbody:
-          print("SIZE MISMATCH SET_BODY_IPOS()")
-          exit(1)
-        
-        for i in range(nbody):
-          c_arr[i] = data[i]
-
-        cassie_sim_set_body_ipos(self.c, c_arr)
+        c_arr = _as_c_buffer(data, self.nbody * 3, "set_body_ipos")
+        cassie_sim_set_body_ipos(self.c, _double_ptr(c_arr))
 
     def set_geom_friction(self, data, name=None):
         if name is None:
-            c_arr = (ctypes.c_double * (self.ngeom*3))()
-
-            if len(data) != self.ngeom*3:
-                print("SIZE MISMATCH SET_GEOM_FRICTION()")
-                exit(1)
-
-            for i in range(self.ngeom*3):
-                c_arr[i] = data[i]
-
-            cassie_sim_set_geom_friction(self.c, c_arr)
+            c_arr = _as_c_buffer(data, self.ngeom * 3, "set_geom_friction")
+            cassie_sim_set_geom_friction(self.c, _double_ptr(c_arr))
         else:
-            fric_array = (ctypes.c_double * 3)()
-            for i in range(3):
-                fric_array[i] = data[i]
-            cassie_sim_set_geom_name_friction(self.c, name.encode(), fric_array)
+            c_arr = _as_c_buffer(data, 3, "set_geom_friction")
+            cassie_sim_set_geom_name_friction(self.c, name.encode(), _double_ptr(c_arr))
 
+    def set_geom_friction_id(self, data, geom_id):
+        self._geom_friction[geom_id] = _as_c_buffer(data, 3, "set_geom_friction_id")
 
     def set_geom_rgba(self, data):
-        ngeom = self.ngeom * 4
+        c_arr = _as_c_buffer(data, self.ngeom * 4, "set_geom_rgba", dtype=np.float32)
+        cassie_sim_set_geom_rgba(self.c, c_arr.ctypes.data_as(ctypes.POINTER(ctypes.c_float)))
 
-        if len(data) != ngeom:
-            print("SIZE MISMATCH SET_GEOM_RGBA()")
-            exit(1)
-
-        c_arr = (ctypes.c_float * ngeom)()
-
-        for i in range(ngeom):
-            c_arr[i] = data[i]
-
-        cassie_sim_set_geom_rgba(self.c, c_arr)
-    
     def set_geom_quat(self, data, name=None):
         if name is None:
-            ngeom = self.ngeom * 4
-
-            if len(data) != ngeom:
-                print("SIZE MISMATCH SET_GEOM_QUAT()")
-                exit(1)
-
-            c_arr = (ctypes.c_double * ngeom)()
-
-            for i in range(ngeom):
-                c_arr[i] = data[i]
-
-            cassie_sim_set_geom_quat(self.c, c_arr)
+            c_arr = _as_c_buffer(data, self.ngeom * 4, "set_geom_quat")
+            cassie_sim_set_geom_quat(self.c, _double_ptr(c_arr))
         else:
-            quat_array = (ctypes.c_double * 4)()
-            for i in range(4):
-                quat_array[i] = data[i]
-            cassie_sim_set_geom_name_quat(self.c, name.encode(), quat_array)
+            c_arr = _as_c_buffer(data, 4, "set_geom_quat")
+            cassie_sim_set_geom_name_quat(self.c, name.encode(), _double_ptr(c_arr))
+
+    def set_geom_quat_id(self, data, geom_id):
+        self._geom_quat[geom_id] = _as_c_buffer(data, 4, "set_geom_quat_id")
 
-    
     def set_const(self):
         cassie_sim_set_const(self.c)
 
@@ -281,6 +362,182 @@ class CassieSim:
     def __del__(self):
         cassie_sim_free(self.c)
 
+# Preallocated per-substep traces filled in by CassieSim.step_pd_n, and the
+# per-step means reduced from them:
+#   foot_frc          left/right foot z-force, mean over the substeps
+#   foot_pos          left/right foot positions (6), mean over the substeps
+#   foot_vel          left/right foot velocities (6) over the last substep
+#   foot_orient_cost  left/right 1 - <neutral_foot_orient, xquat>^2, mean
+class StepAccumulators:
+    def __init__(self, n, neutral_foot_orient=None, dt=0.0005):
+        self.n = n
+        self.dt = dt
+        self.neutral_foot_orient = None if neutral_foot_orient is None else np.array(neutral_foot_orient, dtype=np.float64)
+
+        self.frc_trace  = np.zeros((n, 2))
+        self.pos_trace  = np.zeros((n + 1, 6))  # row 0 is before the first substep
+        self.quat_trace = np.zeros((n, 2, 4))
+
+        self.foot_frc = np.zeros(2)
+        self.foot_pos = np.zeros(6)
+        self.foot_vel = np.zeros(6)
+        self.foot_orient_cost = np.zeros(2)
+
+    def reduce(self):
+        n = self.n
+        self.foot_frc = self.frc_trace.mean(axis=0)
+        self.foot_pos = self.pos_trace[1:].mean(axis=0)
+        self.foot_vel = (self.pos_trace[n] - self.pos_trace[n - 1]) / self.dt
+        if self.neutral_foot_orient is not None:
+            self.foot_orient_cost = (1 - np.dot(self.quat_trace, self.neutral_foot_orient) ** 2).mean(axis=0)
+
+
+# Offsets of the double valued fields of a ctypes struct, as slices into the
+# struct viewed as a flat float64 array, keyed by dotted name ("pelvis.orientation")
+def _double_fields(struct, base=0, prefix=""):
+    fields = {}
+    for name, ftype in struct._fields_:
+        field = getattr(struct, name)
+        offset = base + field.offset
+        if issubclass(ftype, ctypes.Structure):
+            fields.update(_double_fields(ftype, offset, prefix + name + "."))
+        elif ftype is ctypes.c_double or getattr(ftype, "_type_", None) is ctypes.c_double:
+            fields[prefix + name] = slice(offset // 8, (offset + field.size) // 8)
+    return fields
+
+# NumPy view over a state_out_t. The struct is all doubles apart from the radio
+# signalGood flag (padded to 8 bytes), so it is viewed as one flat float64
+# buffer and every field is a named slice of it, e.g. view["motor.position"].
+# The views alias the struct, so writes go straight through to it.
+class StateOutView:
+    fields = _double_fields(state_out_t)
+
+    def __init__(self, state=None):
+        self.state = state_out_t() if state is None else state
+        self.buf = np.frombuffer(self.state, dtype=np.float64)
+        self._views = {name: self.buf[sl] for name, sl in self.fields.items()}
+
+    def __getitem__(self, name):
+        return self._views[name]
+
+    # Flat buffer indices of the given fields in order, so that a set of fields
+    # can be read with a single buf[idx] gather
+    @classmethod
+    def index(cls, names):
+        return np.concatenate([np.arange(cls.fields[name].start, cls.fields[name].stop) for name in names])
+
+    # Copy another state_out_t into this one
+    def load(self, state):
+        self.buf[:] = np.frombuffer(state, dtype=np.float64)
+
+
+# A single reusable pd_in_t with NumPy views over the motorPd arrays of both
+# legs (index 0 is the left leg, 1 the right). Gains are only written when they
+# differ from the last ones set, since they rarely change within an episode.
+class PDCommand:
+    def __init__(self):
+        self.u = pd_in_t()
+        legs = (self.u.leftLeg.motorPd, self.u.rightLeg.motorPd)
+        self.torque  = [np.ctypeslib.as_array(leg.torque) for leg in legs]
+        self.pTarget = [np.ctypeslib.as_array(leg.pTarget) for leg in legs]
+        self.dTarget = [np.ctypeslib.as_array(leg.dTarget) for leg in legs]
+        self.pGain   = [np.ctypeslib.as_array(leg.pGain) for leg in legs]
+        self.dGain   = [np.ctypeslib.as_array(leg.dGain) for leg in legs]
+        self._gains = None
+
+    # 10 position targets, left leg motors first
+    def set_targets(self, targets):
+        self.pTarget[0][:] = targets[0:5]
+        self.pTarget[1][:] = targets[5:10]
+
+    # P and D are either 5 gains used for both legs or 10 gains, left leg first
+    def set_gains(self, P, D):
+        P = _leg_gains(P, "set_gains")
+        D = _leg_gains(D, "set_gains")
+        if self._gains is not None and np.array_equal(P, self._gains[0]) and np.array_equal(D, self._gains[1]):
+            return
+        for leg in range(2):
+            self.pGain[leg][:] = P[leg]
+            self.dGain[leg][:] = D[leg]
+        self._gains = (P.copy(), D.copy())
+
+    def has_gains(self):
+        return self._gains is not None
+
+    # Overwrite the whole command with a copy of another pd_in_t
+    def load(self, u):
+        ctypes.memmove(ctypes.addressof(self.u), ctypes.addressof(u), ctypes.sizeof(pd_in_t))
+        self._gains = None
+
+def _leg_gains(gains, name):
+    gains = np.asarray(gains, dtype=np.float64)
+    if gains.size == 5:
+        return np.broadcast_to(gains, (2, 5))
+    return _as_c_buffer(gains, 10, name).reshape(2, 5)
+
+
+# N sims stepped together with PD control. ctypes releases the GIL for the
+# duration of every library call, so a plain thread pool steps the sims in
+# parallel; each thread owns a fixed slice of the batch. Results are written
+# into the preallocated (N, 35) qpos and (N, 32) qvel arrays, which are reused
+# across calls.
+class CassieSimBatch:
+    def __init__(self, modelfile, num_sims, num_threads=None):
+        self.num_sims = num_sims
+        self.num_threads = min(num_sims, num_threads or os.cpu_count() or 1)
+
+        self.sims = [CassieSim(modelfile) for _ in range(num_sims)]
+        self.cmds = [PDCommand() for _ in range(num_sims)]
+        self.state_out = [state_out_t() for _ in range(num_sims)]
+
+        self.qpos = np.zeros((num_sims, 35))
+        self.qvel = np.zeros((num_sims, 32))
+
+        self._slices = [idx.tolist() for idx in np.array_split(np.arange(num_sims), self.num_threads)]
+        self._pool = ThreadPoolExecutor(max_workers=self.num_threads)
+
+    # P and D broadcast to (N, 10), or (N, 5) for the same gains on both legs
+    def set_gains(self, P, D):
+        P = np.asarray(P, dtype=np.float64)
+        D = np.asarray(D, dtype=np.float64)
+        P = np.broadcast_to(P, (self.num_sims,) + P.shape[-1:])
+        D = np.broadcast_to(D, (self.num_sims,) + D.shape[-1:])
+        for i, cmd in enumerate(self.cmds):
+            cmd.set_gains(P[i], D[i])
+
+    def set_targets(self, targets):
+        targets = _as_c_buffer(targets, self.num_sims * 10, "set_targets").reshape(self.num_sims, 10)
+        for i, cmd in enumerate(self.cmds):
+            cmd.set_targets(targets[i])
+
+    # Steps every sim n times with the given (N, 10) position targets and
+    # returns the qpos/qvel arrays
+    def step_pd(self, targets, P=None, D=None, n=1):
+        if P is not None and D is not None:
+            self.set_gains(P, D)
+        elif P is not None or D is not None:
+            raise ValueError("step_pd: P and D gains must be given together")
+        elif not self.cmds[0].has_gains():
+            raise ValueError("step_pd: gains have not been set")
+        self.set_targets(targets)
+        for _ in self._pool.map(self._step_slice, self._slices, [n] * len(self._slices)):
+            pass
+        return self.qpos, self.qvel
+
+    def _step_slice(self, idx, n):
+        step = cassie_sim_step_pd
+        for i in idx:
+            sim, y, u = self.sims[i], self.state_out[i], self.cmds[i].u
+            c = sim.c
+            for _ in range(n):
+                step(c, y, u)
+            self.qpos[i] = sim._qpos
+            self.qvel[i] = sim._qvel
+
+    def close(self):
+        self._pool.shutdown()
+
+
 class CassieVis:
     def __init__(self, c, modelfile):
         self.v = cassie_vis_init(c.c, modelfile.encode('utf-8'))
@@ -315,31 +572,37 @@ class CassieState:
     def __init__(self):
         self.s = cassie_state_alloc()
 
+    def duplicate(self):
+        s = CassieState.__new__(CassieState)
+        s.s = cassie_state_duplicate(self.s)
+        return s
+
+    def copy_from(self, other):
+        cassie_state_copy(self.s, other.s)
+
     def time(self):
         timep = cassie_state_time(self.s)
         return timep[0]
 
-    def qpos(self):
-        qposp = cassie_state_qpos(self.s)
-        return qposp[:35]
+    def qpos(self, copy=True):
+        qpos = np.ctypeslib.as_array(cassie_state_qpos(self.s), shape=(35,))
+        return qpos.copy() if copy else qpos
 
-    def qvel(self):
-        qvelp = cassie_state_qvel(self.s)
-        return qvelp[:32]
+    def qvel(self, copy=True):
+        qvel = np.ctypeslib.as_array(cassie_state_qvel(self.s), shape=(32,))
+        return qvel.copy() if copy else qvel
 
     def set_time(self, time):
         timep = cassie_state_time(self.s)
         timep[0] = time
 
     def set_qpos(self, qpos):
-        qposp = cassie_state_qpos(self.s)
-        for i in range(min(len(qpos), 35)):
-            qposp[i] = qpos[i]
+        n = min(len(qpos), 35)
+        self.qpos(copy=False)[:n] = qpos[:n]
 
     def set_qvel(self, qvel):
-        qvelp = cassie_state_qvel(self.s)
-        for i in range(min(len(qvel), 32)):
-            qvelp[i] = qvel[i]
+        n = min(len(qvel), 32)
+        self.qvel(copy=False)[:n] = qvel[:n]
 
     def __del__(self):
         cassie_state_free(self.s)
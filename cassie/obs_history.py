@@ -0,0 +1,26 @@
+import numpy as np
+
+# Last history+1 observations, newest first, as one flat vector. Each frame is
+# written twice (row i and row i+n) into a buffer of 2n rows, so the newest n
+# frames are always the contiguous rows [i, i+n) and no list shuffling or
+# concatenation is needed per step.
+class ObsHistory:
+    def __init__(self, obs_dim, history=0):
+        self.n = history + 1
+        self.obs_dim = obs_dim
+        self.buf = np.zeros((2 * self.n, obs_dim))
+        self.i = 0
+
+    def reset(self):
+        self.buf.fill(0)
+        self.i = 0
+
+    def push(self, obs):
+        self.i = (self.i - 1) % self.n
+        self.buf[self.i] = obs
+        self.buf[self.i + self.n] = obs
+        return self.view().copy()
+
+    # Flat (n * obs_dim) view of the current window, invalidated by the next push
+    def view(self):
+        return self.buf[self.i:self.i + self.n].reshape(-1)
@@ -1,72 +1,89 @@
 import math
 import numpy as np
 
-def inverse_quaternion(quaternion):
-	result = np.copy(quaternion)
-	result[1:4] = -result[1:4]
-	return result
+# Quaternions are [w, x, y, z] along the last axis. Every function accepts a
+# single quaternion/vector or a batch of shape (..., 4) / (..., 3), broadcasts
+# its arguments, and writes into out= when given (all components are computed
+# before anything is written, so out may alias an input).
+# See quaternion_torch.py for the same functions on torch tensors.
 
-def quaternion_product(q1, q2):
-	result = np.zeros(4)
-	result[0] = q1[0]*q2[0]-q1[1]*q2[1]-q1[2]*q2[2]-q1[3]*q2[3]
-	result[1] = q1[0]*q2[1]+q2[0]*q1[1]+q1[2]*q2[3]-q1[3]*q2[2]
-	result[2] = q1[0]*q2[2]-q1[1]*q2[3]+q1[2]*q2[0]+q1[3]*q2[1]
-	result[3] = q1[0]*q2[3]+q1[1]*q2[2]-q1[2]*q2[1]+q1[3]*q2[0]
-	return result
+# Components along the last axis. A single quaternion/vector is split into
+# python floats, which is several times faster than numpy scalar math for the
+# once-per-step calls in the envs.
+def _split(a):
+	a = np.asarray(a)
+	if a.ndim == 1:
+		return a.tolist()
+	return np.moveaxis(a, -1, 0)
 
-def rotate_by_quaternion(vector, quaternion):
-	q1 = np.copy(quaternion)
-	q2 = np.zeros(4)
-	q2[1:4] = np.copy(vector)
-	q3 = inverse_quaternion(quaternion)
-	q = quaternion_product(q2, q3)
-	q = quaternion_product(q1, q)
-	result = q[1:4]
-	return result
+def _pack(out, *comps):
+	if out is None:
+		if not isinstance(comps[0], np.ndarray):
+			return np.array(comps)
+		out = np.empty(np.broadcast(*comps).shape + (len(comps),))
+	for i, c in enumerate(comps):
+		out[..., i] = c
+	return out
 
-def quaternion2euler(quaternion):
-	w = quaternion[0]
-	x = quaternion[1]
-	y = quaternion[2]
-	z = quaternion[3]
+def inverse_quaternion(quaternion, out=None):
+	w, x, y, z = _split(quaternion)
+	return _pack(out, w, -x, -y, -z)
+
+def quaternion_product(q1, q2, out=None):
+	w1, x1, y1, z1 = _split(q1)
+	w2, x2, y2, z2 = _split(q2)
+	w = w1*w2 - x1*x2 - y1*y2 - z1*z2
+	x = w1*x2 + w2*x1 + y1*z2 - z1*y2
+	y = w1*y2 - x1*z2 + y1*w2 + z1*x2
+	z = w1*z2 + x1*y2 - y1*x2 + z1*w2
+	return _pack(out, w, x, y, z)
+
+# Vector part of q * [0, v] * q^-1, expanded so no intermediate quaternions are
+# built: (w^2 - |u|^2) v + 2 (u.v) u + 2 w (u x v), with u = q[1:4].
+def rotate_by_quaternion(vector, quaternion, out=None):
+	vx, vy, vz = _split(vector)
+	w, ux, uy, uz = _split(quaternion)
+	s = w*w - (ux*ux + uy*uy + uz*uz)
+	d = 2 * (ux*vx + uy*vy + uz*vz)
+	w2 = 2 * w
+	x = s*vx + d*ux + w2*(uy*vz - uz*vy)
+	y = s*vy + d*uy + w2*(uz*vx - ux*vz)
+	z = s*vz + d*uz + w2*(ux*vy - uy*vx)
+	return _pack(out, x, y, z)
+
+# Returns [roll, pitch, yaw] in radians
+def quaternion2euler(quaternion, out=None):
+	w, x, y, z = _split(quaternion)
 	ysqr = y * y
-	
+
 	t0 = +2.0 * (w * x + y * z)
 	t1 = +1.0 - 2.0 * (x * x + ysqr)
-	X = math.degrees(math.atan2(t0, t1))
-	
 	t2 = +2.0 * (w * y - z * x)
-	t2 = +1.0 if t2 > +1.0 else t2
-	t2 = -1.0 if t2 < -1.0 else t2
-	Y = math.degrees(math.asin(t2))
-	
 	t3 = +2.0 * (w * z + x * y)
 	t4 = +1.0 - 2.0 * (ysqr + z * z)
-	Z = math.degrees(math.atan2(t3, t4))
-
-	result = np.zeros(3)
-	result[0] = X * np.pi / 180
-	result[1] = Y * np.pi / 180
-	result[2] = Z * np.pi / 180
-	
-	return result
 
-def euler2quat(z=0, y=0, x=0):
+	if isinstance(w, np.ndarray):
+		return _pack(out, np.arctan2(t0, t1), np.arcsin(np.clip(t2, -1.0, 1.0)), np.arctan2(t3, t4))
+	return _pack(out, math.atan2(t0, t1), math.asin(min(max(t2, -1.0), 1.0)), math.atan2(t3, t4))
 
-    z = z/2.0
-    y = y/2.0
-    x = x/2.0
-    cz = math.cos(z)
-    sz = math.sin(z)
-    cy = math.cos(y)
-    sy = math.sin(y)
-    cx = math.cos(x)
-    sx = math.sin(x)
-    result =  np.array([
-             cx*cy*cz - sx*sy*sz,
-             cx*sy*sz + cy*cz*sx,
-             cx*cz*sy - sx*cy*sz,
-             cx*cy*sz + sx*cz*sy])
-    if result[0] < 0:
-    	result = -result
-    return result
\ No newline at end of file
+# z, y, x may be scalars or arrays (broadcast together); the result is flipped to w >= 0
+def euler2quat(z=0, y=0, x=0, out=None):
+	if np.ndim(z) == 0 and np.ndim(y) == 0 and np.ndim(x) == 0:
+		cos, sin = math.cos, math.sin
+		z, y, x = float(z) / 2.0, float(y) / 2.0, float(x) / 2.0
+	else:
+		cos, sin = np.cos, np.sin
+		z, y, x = np.multiply(z, 0.5), np.multiply(y, 0.5), np.multiply(x, 0.5)
+	cz = cos(z)
+	sz = sin(z)
+	cy = cos(y)
+	sy = sin(y)
+	cx = cos(x)
+	sx = sin(x)
+	w = cx*cy*cz - sx*sy*sz
+	qx = cx*sy*sz + cy*cz*sx
+	qy = cx*cz*sy - sx*cy*sz
+	qz = cx*cy*sz + sx*cz*sy
+	out = _pack(out, w, qx, qy, qz)
+	np.negative(out, out=out, where=out[..., 0:1] < 0)
+	return out
@@ -0,0 +1,50 @@
+import torch
+
+# torch versions of cassie/quaternion_function.py for (..., 4) / (..., 3) tensors,
+# differentiable so they can be used on observation batches inside the loss
+# (e.g. to mirror or re-rotate the pelvis orientation in the mirror loss).
+
+def inverse_quaternion(quaternion, out=None):
+	w, x, y, z = quaternion.unbind(-1)
+	return torch.stack([w, -x, -y, -z], dim=-1, out=out)
+
+def quaternion_product(q1, q2, out=None):
+	w1, x1, y1, z1 = q1.unbind(-1)
+	w2, x2, y2, z2 = q2.unbind(-1)
+	w = w1*w2 - x1*x2 - y1*y2 - z1*z2
+	x = w1*x2 + w2*x1 + y1*z2 - z1*y2
+	y = w1*y2 - x1*z2 + y1*w2 + z1*x2
+	z = w1*z2 + x1*y2 - y1*x2 + z1*w2
+	w, x, y, z = torch.broadcast_tensors(w, x, y, z)
+	return torch.stack([w, x, y, z], dim=-1, out=out)
+
+def rotate_by_quaternion(vector, quaternion, out=None):
+	vx, vy, vz = vector.unbind(-1)
+	w, ux, uy, uz = quaternion.unbind(-1)
+	s = w*w - (ux*ux + uy*uy + uz*uz)
+	d = 2 * (ux*vx + uy*vy + uz*vz)
+	w2 = 2 * w
+	x = s*vx + d*ux + w2*(uy*vz - uz*vy)
+	y = s*vy + d*uy + w2*(uz*vx - ux*vz)
+	z = s*vz + d*uz + w2*(ux*vy - uy*vx)
+	return torch.stack([x, y, z], dim=-1, out=out)
+
+def quaternion2euler(quaternion, out=None):
+	w, x, y, z = quaternion.unbind(-1)
+	ysqr = y * y
+	X = torch.atan2(2.0 * (w * x + y * z), 1.0 - 2.0 * (x * x + ysqr))
+	Y = torch.asin(torch.clamp(2.0 * (w * y - z * x), -1.0, 1.0))
+	Z = torch.atan2(2.0 * (w * z + x * y), 1.0 - 2.0 * (ysqr + z * z))
+	return torch.stack([X, Y, Z], dim=-1, out=out)
+
+def euler2quat(z=0, y=0, x=0, out=None):
+	z, y, x = torch.broadcast_tensors(*(torch.as_tensor(a, dtype=torch.get_default_dtype()) * 0.5 for a in (z, y, x)))
+	cz, sz = torch.cos(z), torch.sin(z)
+	cy, sy = torch.cos(y), torch.sin(y)
+	cx, sx = torch.cos(x), torch.sin(x)
+	w = cx*cy*cz - sx*sy*sz
+	sign = torch.where(w < 0, -torch.ones_like(w), torch.ones_like(w))
+	return torch.stack([sign * w,
+	                    sign * (cx*sy*sz + cy*cz*sx),
+	                    sign * (cx*cz*sy - sx*cy*sz),
+	                    sign * (cx*cy*sz + sx*cz*sy)], dim=-1, out=out)
@@ -4,8 +4,8 @@ from cassie.trajectory.aslip_trajectory import get_ref_aslip_ext_state, get_ref_
 
 def aslip_old_reward(self, action):
 
-    qpos = np.copy(self.sim.qpos())
-    qvel = np.copy(self.sim.qvel())
+    qpos = self.sim.qpos(copy=False)
+    qvel = self.sim.qvel(copy=False)
 
     ref_pos, ref_vel = self.get_ref_state(self.phase)
 
@@ -69,8 +69,8 @@ def aslip_old_reward(self, action):
 
 def aslip_oldMujoco_reward(self, action):
 
-    qpos = np.copy(self.sim.qpos())
-    qvel = np.copy(self.sim.qvel())
+    qpos = self.sim.qpos()
+    qvel = self.sim.qvel()
 
     ref_pos, ref_vel = self.get_ref_state(self.phase)
 
@@ -159,8 +159,8 @@ def aslip_oldMujoco_reward(self, action):
 
 def aslip_joint_reward(self, action):
 
-    qpos = np.copy(self.sim.qpos())
-    qvel = np.copy(self.sim.qvel())
+    qpos = self.sim.qpos()
+    qvel = self.sim.qvel()
 
     ref_pos, ref_vel = self.get_ref_state(self.phase)
 
@@ -244,8 +244,8 @@ def aslip_joint_reward(self, action):
 
 def aslip_comorientheight_reward(self, action):
 
-    qpos = np.copy(self.sim.qpos())
-    qvel = np.copy(self.sim.qvel())
+    qpos = self.sim.qpos()
+    qvel = self.sim.qvel()
 
     ref_pos, ref_vel = self.get_ref_state(self.phase)
 
@@ -335,8 +335,8 @@ def aslip_comorientheight_reward(self, action):
 
 # USING Mujoco State
 def aslip_TaskSpaceMujoco_reward(self, action):
-    qpos = np.copy(self.sim.qpos())
-    qvel = np.copy(self.sim.qvel())
+    qpos = self.sim.qpos()
+    qvel = self.sim.qvel()
     
     phase_to_match = self.phase
 
@@ -401,8 +401,8 @@ def aslip_TaskSpaceMujoco_reward(self, action):
 
 # Using Mujoco State
 def aslip_DirectMatchMujoco_reward(self, action):
-    qpos = np.copy(self.sim.qpos())
-    qvel = np.copy(self.sim.qvel())
+    qpos = self.sim.qpos()
+    qvel = self.sim.qvel()
     
     phase_to_match = self.phase
 
@@ -466,8 +466,8 @@ def aslip_DirectMatchMujoco_reward(self, action):
 
 # USING State Est
 def aslip_TaskSpaceStateEst_reward(self, action):
-    qpos = np.copy(self.sim.qpos())
-    qvel = np.copy(self.sim.qvel())
+    qpos = self.sim.qpos()
+    qvel = self.sim.qvel()
     
     phase_to_match = self.phase
 
@@ -532,8 +532,8 @@ def aslip_TaskSpaceStateEst_reward(self, action):
 
 # USING State Est
 def aslip_DirectMatchStateEst_reward(self, action):
-    qpos = np.copy(self.sim.qpos())
-    qvel = np.copy(self.sim.qvel())
+    qpos = self.sim.qpos()
+    qvel = self.sim.qvel()
     
     phase_to_match = self.phase
 
@@ -600,8 +600,8 @@ def aslip_DirectMatchStateEst_reward(self, action):
 ### Reward from rss submission:
 
 # def aslip_TaskSpace_reward(self, action):
-#     qpos = np.copy(self.sim.qpos())
-#     qvel = np.copy(self.sim.qvel())
+#     qpos = self.sim.qpos()
+#     qvel = self.sim.qvel()
 
 #     ref_pos, ref_vel = self.get_ref_state(self.phase)
 
@@ -678,8 +678,8 @@ Old rewards
 
 def aslip_strict_reward(self, action):
 
-    qpos = np.copy(self.sim.qpos())
-    qvel = np.copy(self.sim.qvel())
+    qpos = self.sim.qpos()
+    qvel = self.sim.qvel()
 
     ref_pos, ref_vel = self.get_ref_state(self.phase)
 
@@ -759,8 +759,8 @@ def aslip_strict_reward(self, action):
 
 def aslip_heightpenalty_reward(self, action):
 
-    qpos = np.copy(self.sim.qpos())
-    qvel = np.copy(self.sim.qvel())
+    qpos = self.sim.qpos()
+    qvel = self.sim.qvel()
 
     ref_pos, ref_vel = self.get_ref_state(self.phase)
 
@@ -844,8 +844,8 @@ def aslip_heightpenalty_reward(self, action):
 
 def aslip_comorient_reward(self, action):
 
-    qpos = np.copy(self.sim.qpos())
-    qvel = np.copy(self.sim.qvel())
+    qpos = self.sim.qpos()
+    qvel = self.sim.qvel()
 
     ref_pos, ref_vel = self.get_ref_state(self.phase)
 
@@ -923,8 +923,8 @@ def aslip_comorient_reward(self, action):
 
 def aslip_comorient_heightpenalty_reward(self, action):
 
-    qpos = np.copy(self.sim.qpos())
-    qvel = np.copy(self.sim.qvel())
+    qpos = self.sim.qpos()
+    qvel = self.sim.qvel()
 
     ref_pos, ref_vel = self.get_ref_state(self.phase)
 
@@ -5,8 +5,8 @@ from cassie.trajectory.aslip_trajectory import get_ref_aslip_ext_state, get_ref_
 
 def clock_reward(self, action):
 
-    qpos = np.copy(self.sim.qpos())
-    qvel = np.copy(self.sim.qvel())
+    qpos = self.sim.qpos(copy=False)
+    qvel = self.sim.qvel(copy=False)
 
     # These used for normalizing the foot forces and velocities
     desired_max_foot_frc = 400
@@ -91,8 +91,8 @@ def clock_reward(self, action):
 
 def aslip_clock_reward(self, action):
 
-    qpos = np.copy(self.sim.qpos())
-    qvel = np.copy(self.sim.qvel())
+    qpos = self.sim.qpos(copy=False)
+    qvel = self.sim.qvel(copy=False)
 
     # These used for normalizing the foot forces and velocities
     desired_max_foot_frc = 400
@@ -190,8 +190,8 @@ def aslip_clock_reward(self, action):
 
 def max_vel_clock_reward(self, action):
 
-    qpos = np.copy(self.sim.qpos())
-    qvel = np.copy(self.sim.qvel())
+    qpos = self.sim.qpos(copy=False)
+    qvel = self.sim.qvel(copy=False)
 
     # These used for normalizing the foot forces and velocities
     desired_max_foot_frc = 400
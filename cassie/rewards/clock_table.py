@@ -0,0 +1,72 @@
+# Clock functions of the clock based rewards, tabulated on a phase grid.
+#
+# The reward_clock_funcs/*.pkl files hold one scipy interpolator per trajectory
+# speed for each foot. Rather than calling those every step, each is evaluated
+# once on a grid of `resolution` points per phase over its breakpoint range.
+# Phases on the grid (every integer phase) read the table directly, and
+# phases between grid points are linearly interpolated, so with the default
+# phase_add of 1 the values are exactly those of the original function. The
+# tables of a file are built once per process and shared by every env.
+import pickle
+
+import numpy as np
+
+clock_table_resolution = 10
+
+_clock_tables = {}
+
+# {"left": [ClockTable per speed], "right": [...]} for a clock funcs file
+def load_clock_tables(path, resolution=clock_table_resolution):
+    key = (path, resolution)
+    tables = _clock_tables.get(key)
+    if tables is None:
+        with open(path, "rb") as f:
+            clock_funcs = pickle.load(f)
+        tables = {side: [ClockTable(fn, resolution) for fn in fns] for side, fns in clock_funcs.items()}
+        _clock_tables[key] = tables
+    return tables
+
+# The pickled interpolators are piecewise polynomials. Pickles written with an
+# older scipy load on newer versions but can't be called, so those are rebuilt
+# from their breakpoints and coefficients.
+def _piecewise_poly(fn):
+    try:
+        fn(0.0)
+        return fn
+    except AttributeError:
+        from scipy.interpolate import PPoly
+        state = fn.__getstate__()
+        if isinstance(state, tuple):
+            state = dict(state[0] or {}, **state[1])
+        c = state["c"] if "c" in state else state["_c"]
+        x = state["x"] if "x" in state else state["_x"]
+        return PPoly(c, x, extrapolate=state.get("extrapolate", True))
+
+class ClockTable:
+    def __init__(self, fn, resolution=clock_table_resolution):
+        self.fn = _piecewise_poly(fn)
+        self.resolution = resolution
+        x = np.asarray(self.fn.x)
+        self.start = np.ceil(x[0])
+        self.last = int((np.floor(x[-1]) - self.start) * resolution)
+        self.grid = self.start + np.arange(self.last + 1) / resolution
+        self.values = np.asarray(self.fn(self.grid), dtype=float)
+        self.values.flags.writeable = False
+        self._values = self.values.tolist()   # python floats for the scalar path
+
+    def __call__(self, phase):
+        if isinstance(phase, np.ndarray):
+            out = np.interp(phase, self.grid, self.values)
+            outside = (phase < self.grid[0]) | (phase > self.grid[-1])
+            if outside.any():
+                out[outside] = self.fn(phase[outside])
+            return out
+        p = (phase - self.start) * self.resolution
+        i = int(p)
+        if p >= 0 and i < self.last:
+            v = self._values[i]
+            frac = p - i
+            return v if frac == 0 else v + frac * (self._values[i + 1] - v)
+        if p == self.last:
+            return self._values[-1]
+        return float(self.fn(phase))
@@ -1,8 +1,8 @@
 import numpy as np
 
 def iros_paper_reward(self):
-    qpos = np.copy(self.sim.qpos())
-    qvel = np.copy(self.sim.qvel())
+    qpos = self.sim.qpos(copy=False)
+    qvel = self.sim.qvel(copy=False)
 
     ref_pos, ref_vel = self.get_ref_state(self.phase)
 
@@ -0,0 +1,208 @@
+# Registry of the CassieEnv_v2 rewards. Each entry has a builder that is run
+# once when the env is constructed and returns a kernel(self, snap, action),
+# with the index arrays and weight vectors the reward needs precomputed, and
+# the plain reward function it reimplements (used when self.debug is set, since
+# that one prints the breakdown, and by tools/bench_rewards.py to check and
+# time the kernels against).
+import math
+from collections import namedtuple
+
+import numpy as np
+
+from .clock_rewards import clock_reward, aslip_clock_reward, max_vel_clock_reward
+from .aslip_rewards import aslip_old_reward
+from .iros_paper_reward import iros_paper_reward
+from .speedmatch_rewards import old_speed_reward
+
+RewardEntry = namedtuple("RewardEntry", ["build", "reference", "early_term_cutoff"])
+
+# Values shared by the kernels for one step, refreshed by compute_reward
+class RewardSnapshot:
+    def __init__(self):
+        self.qpos = None
+        self.qvel = None
+        self._env = None
+        self._ref = None
+
+    def update(self, env):
+        self.qpos = env.sim.qpos(copy=False)
+        self.qvel = env.sim.qvel(copy=False)
+        self._env = env
+        self._ref = None
+
+    # get_ref_state(phase), looked up at most once per step
+    def ref_state(self):
+        if self._ref is None:
+            self._ref = self._env.get_ref_state(self._env.phase)
+        return self._ref
+
+# aslip reference foot positions and com velocity for the current phase, same
+# rows as get_ref_aslip_unaltered_state without the copies
+def _aslip_ref(self):
+    phase = self.phase
+    if phase > self.phaselen:
+        phase = 0
+    phase = int(phase)
+    traj = self.trajectory
+    return traj.rpos[phase], traj.lpos[phase], traj.cvel[phase]
+
+# abs(qpos[1]) and abs(qpos[2] - 1) with their deadzones, shared by the clock rewards
+def _straight_diff(qpos):
+    straight_diff = abs(qpos[1])
+    if straight_diff < 0.05:
+        straight_diff = 0
+    height_diff = abs(qpos[2] - 1.0)
+    if height_diff < 0.2:
+        height_diff = 0
+    return straight_diff + height_diff
+
+# tanh foot force and foot velocity penalties against the phase clocks
+def _clock_penalties(self, max_frc, max_vel):
+    left_clock = self.left_clock(self.phase)
+    right_clock = self.right_clock(self.phase)
+    l_vel = self.l_foot_vel
+    r_vel = self.r_foot_vel
+    normed_left_vel = math.sqrt(l_vel @ l_vel) / max_vel
+    normed_right_vel = math.sqrt(r_vel @ r_vel) / max_vel
+    foot_frc_penalty = math.tanh(left_clock * self.l_foot_frc / max_frc) + math.tanh(right_clock * self.r_foot_frc / max_frc)
+    foot_vel_penalty = math.tanh(-left_clock * normed_left_vel) + math.tanh(-right_clock * normed_right_vel)
+    return foot_frc_penalty, foot_vel_penalty
+
+def _build_clock(env):
+    def kernel(self, snap, action):
+        qpos = snap.qpos
+        com_orient_error = 1 - qpos[3] ** 2
+        foot_orient_error = self.l_foot_orient_cost + self.r_foot_orient_cost
+        com_vel_error = abs(snap.qvel[0] - self.speed)
+        foot_frc_penalty, foot_vel_penalty = _clock_penalties(self, 400, 3.0)
+        return 0.1 * math.exp(-com_orient_error) + \
+               0.1 * math.exp(-foot_orient_error) + \
+               0.2 * math.exp(-com_vel_error) + \
+               0.1 * math.exp(-_straight_diff(qpos)) + \
+               0.25 * foot_frc_penalty + \
+               0.25 * foot_vel_penalty
+    return kernel
+
+def _build_max_vel_clock(env):
+    def kernel(self, snap, action):
+        qpos = snap.qpos
+        com_orient_error = 15 * (1 - qpos[3] ** 2)
+        foot_orient_error = self.l_foot_orient_cost + self.r_foot_orient_cost
+        com_vel_bonus = snap.qvel[0] / 3.0
+        foot_frc_penalty, foot_vel_penalty = _clock_penalties(self, 400, 2.0)
+        return 0.1 * math.exp(-com_orient_error) + \
+               0.1 * math.exp(-foot_orient_error) + \
+               0.1 * math.exp(-_straight_diff(qpos)) + \
+               0.2 * foot_frc_penalty + \
+               0.2 * foot_vel_penalty + \
+               0.3 * com_vel_bonus
+    return kernel
+
+def _build_aslip_clock(env):
+    def kernel(self, snap, action):
+        qpos = snap.qpos
+        ref_rfoot, ref_lfoot, ref_cvel = _aslip_ref(self)
+        com_orient_error = 1 - qpos[3] ** 2
+        foot_orient_error = self.l_foot_orient_cost + self.r_foot_orient_cost
+        # xy foot pos error and com vel error
+        foot_pos_error = np.abs(self.l_foot_pos[0:2] - ref_lfoot[0:2]).sum() + np.abs(self.r_foot_pos[0:2] - ref_rfoot[0:2]).sum()
+        com_vel_error = np.abs(snap.qvel[0:3] - ref_cvel[0:3]).sum()
+        foot_frc_penalty, foot_vel_penalty = _clock_penalties(self, 400, 2.0)
+        return 0.05 * math.exp(-com_orient_error) + \
+               0.05 * math.exp(-foot_orient_error) + \
+               0.2 * math.exp(-foot_pos_error) + \
+               0.2 * math.exp(-com_vel_error) + \
+               0.1 * math.exp(-_straight_diff(qpos)) + \
+               0.2 * foot_frc_penalty + \
+               0.2 * foot_vel_penalty
+    return kernel
+
+def _build_aslip_old(env):
+    lfoot_pos = env.state_view["leftFoot.position"]
+    rfoot_pos = env.state_view["rightFoot.position"]
+    com_vel = env.state_view["pelvis.translationalVelocity"]
+    def kernel(self, snap, action):
+        ref_rfoot, ref_lfoot, ref_cvel = _aslip_ref(self)
+        footpos_error = np.abs(lfoot_pos - ref_lfoot[0:3]).sum() + np.abs(rfoot_pos - ref_rfoot[0:3]).sum()
+        com_vel_error = np.abs(com_vel - ref_cvel[0:3]).sum()
+        action_penalty = np.linalg.norm(action - self.prev_action)
+        foot_orient_penalty = self.l_foot_orient_cost + self.r_foot_orient_cost
+        straight_diff = abs(snap.qpos[1])
+        if straight_diff < 0.05:
+            straight_diff = 0
+        return 0.3 * math.exp(-footpos_error) + \
+               0.3 * math.exp(-com_vel_error) + \
+               0.1 * math.exp(-action_penalty) + \
+               0.2 * math.exp(-foot_orient_penalty) + \
+               0.1 * math.exp(-straight_diff)
+    return kernel
+
+# One gather over joint, com, orientation and spring indices of qpos, then a
+# weighted sum per term with reduceat
+def _build_iros_paper(env):
+    joint_weight = np.array([0.15, 0.15, 0.1, 0.05, 0.05, 0.15, 0.15, 0.1, 0.05, 0.05])
+    idx = np.array(list(env.pos_idx) + [0, 1, 2] + [4, 5, 6] + [15, 29])
+    weight = np.concatenate([30 * joint_weight, np.ones(3), np.ones(3), np.full(2, 1000.0)])
+    terms = np.array([0, len(env.pos_idx), len(env.pos_idx) + 3, len(env.pos_idx) + 6])
+    term_weight = np.array([0.5, 0.3, 0.1, 0.1])
+    def kernel(self, snap, action):
+        ref_pos, _ = snap.ref_state()
+        err = ref_pos[idx] - snap.qpos[idx]
+        return term_weight @ np.exp(-np.add.reduceat(weight * err * err, terms))
+    return kernel
+
+def _build_old_speed(env):
+    orient_targ = np.array([1.0, 0, 0, 0])
+    def kernel(self, snap, action):
+        qpos, qvel = snap.qpos, snap.qvel
+        diff = abs(qvel[0] - self.speed)
+        if diff < 0.05:
+            diff = 0
+        orient_diff = np.linalg.norm(qpos[3:7] - orient_targ)
+        y_vel = abs(qvel[1])
+        if y_vel < 0.03:
+            y_vel = 0
+        straight_diff = abs(qpos[1])
+        if straight_diff < 0.05:
+            straight_diff = 0
+        return .5*math.exp(-diff) + .15*math.exp(-orient_diff) + .1*math.exp(-y_vel) + .25 * math.exp(-straight_diff)
+    return kernel
+
+reward_registry = {
+    "clock":           RewardEntry(_build_clock,         clock_reward,         0.2),
+    "max_vel_clock":   RewardEntry(_build_max_vel_clock, max_vel_clock_reward, 0.2),
+    "aslip_clock":     RewardEntry(_build_aslip_clock,   aslip_clock_reward,   0.2),
+    "aslip_old":       RewardEntry(_build_aslip_old,     aslip_old_reward,     0.0),
+    "iros_paper":      RewardEntry(_build_iros_paper,    lambda self, action: iros_paper_reward(self), None),
+    "5k_speed_reward": RewardEntry(_build_old_speed,     lambda self, action: old_speed_reward(self),  None),
+}
+
+# Clock based reward variants, each loading its clock functions from reward_clock_funcs/
+clock_rewards         = ["clock_smooth", "clock_strict0.1", "clock_strict0.4",
+                         "clock_smooth_aerial", "clock_strict0.1_aerial", "clock_strict0.4_aerial"]
+aslip_clock_rewards   = ["aslip_clock_smooth", "aslip_clock_smooth_aerial",
+                         "aslip_clock_strict0.1", "aslip_clock_strict0.1_aerial",
+                         "aslip_clock_strict0.4", "aslip_clock_strict0.4_aerial"]
+max_vel_clock_rewards = ["max_vel_clock_smooth", "max_vel_clock_strict0.1", "max_vel_clock_strict0.4",
+                         "max_vel_clock_smooth_aerial", "max_vel_clock_strict0.1_aerial", "max_vel_clock_strict0.4_aerial"]
+
+# Registry name and clock funcs file of a reward argument (file is None for
+# rewards without clocks)
+def clock_reward_variant(name):
+    # TODO: Get dedicated reward funcs for clock reward
+    if name in clock_rewards:
+        return "clock", "aslip_" + name + ".pkl"
+    elif name in aslip_clock_rewards:
+        return "aslip_clock", name + ".pkl"
+    elif name in max_vel_clock_rewards:
+        return "max_vel_clock", "aslip_" + name[8:] + ".pkl"
+    return name, None
+
+# Look up a reward by name and build its kernel for this env. Returns the
+# kernel, the reference function and the early termination cutoff (None to
+# keep the env default).
+def resolve_reward(env, name):
+    if name not in reward_registry:
+        raise NotImplementedError("unknown reward function {}".format(name))
+    entry = reward_registry[name]
+    return entry.build(env), entry.reference, entry.early_term_cutoff
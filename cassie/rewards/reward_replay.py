@@ -0,0 +1,235 @@
+# Offline reward evaluation. RewardRecorder stores the quantities the
+# registered rewards read from a CassieEnv_v2 at every step as columns (one
+# array per quantity, rows are steps), and evaluate_reward recomputes any
+# registered reward, or a clock variant of one, over all recorded rows at once.
+# Each batch kernel here is the row-wise version of the kernel of the same name
+# in reward_registry.py.
+import os
+import pickle
+
+import numpy as np
+
+from .reward_registry import clock_reward_variant
+from .clock_table import load_clock_tables
+
+clock_funcs_dir = os.path.join(os.path.dirname(__file__), "reward_clock_funcs")
+
+class RewardRecorder:
+    def __init__(self, env, chunk_size=10000):
+        self.env = env
+        self.chunk_size = chunk_size
+        self._chunks = []   # list of (dict of column arrays, rows used)
+        self._new_chunk()
+
+    # column name -> width, read from the env after each step
+    def _widths(self):
+        env = self.env
+        widths = {
+            "qpos": 35, "qvel": 32, "ref_pos": 35,
+            "l_foot_frc": 1, "r_foot_frc": 1,
+            "l_foot_vel": 3, "r_foot_vel": 3,
+            "l_foot_pos": 3, "r_foot_pos": 3,
+            "l_foot_orient_cost": 1, "r_foot_orient_cost": 1,
+            "est_l_foot_pos": 3, "est_r_foot_pos": 3, "est_com_vel": 3,
+            "phase": 1, "speed": 1, "traj_idx": 1,
+            "action": 10, "prev_action": 10,
+            "reward": 1, "done": 1,
+        }
+        if env.aslip_traj:
+            widths.update({"aslip_ref_lpos": 3, "aslip_ref_rpos": 3, "aslip_ref_cvel": 3})
+        return widths
+
+    def _new_chunk(self):
+        self._chunks.append(({name: np.zeros((self.chunk_size, w)) for name, w in self._widths().items()}, 0))
+
+    def __len__(self):
+        return sum(n for _, n in self._chunks)
+
+    # env.step(action), recording the step
+    def step(self, action):
+        env = self.env
+        prev_action = np.copy(env.prev_action)
+        result = env.step(action)
+        self.record(prev_action, result[-3], result[-2])
+        return result
+
+    # Record the env's current step. prev_action is the env's prev_action
+    # before the step, since the rewards penalize the change in action.
+    def record(self, prev_action, reward, done):
+        cols, n = self._chunks[-1]
+        if n == self.chunk_size:
+            self._new_chunk()
+            cols, n = self._chunks[-1]
+
+        env = self.env
+        sv = env.state_view
+        cols["qpos"][n]               = env.sim.qpos(copy=False)
+        cols["qvel"][n]               = env.sim.qvel(copy=False)
+        cols["ref_pos"][n]            = env.get_ref_state(env.phase)[0]
+        cols["l_foot_frc"][n]         = env.l_foot_frc
+        cols["r_foot_frc"][n]         = env.r_foot_frc
+        cols["l_foot_vel"][n]         = env.l_foot_vel
+        cols["r_foot_vel"][n]         = env.r_foot_vel
+        cols["l_foot_pos"][n]         = env.l_foot_pos
+        cols["r_foot_pos"][n]         = env.r_foot_pos
+        cols["l_foot_orient_cost"][n] = env.l_foot_orient_cost
+        cols["r_foot_orient_cost"][n] = env.r_foot_orient_cost
+        cols["est_l_foot_pos"][n]     = sv["leftFoot.position"]
+        cols["est_r_foot_pos"][n]     = sv["rightFoot.position"]
+        cols["est_com_vel"][n]        = sv["pelvis.translationalVelocity"]
+        cols["phase"][n]              = env.phase
+        cols["speed"][n]              = env.speed
+        cols["traj_idx"][n]           = getattr(env, "traj_idx", 0)
+        cols["action"][n]             = env.prev_action
+        cols["prev_action"][n]        = prev_action
+        cols["reward"][n]             = reward
+        cols["done"][n]               = done
+        if env.aslip_traj:
+            phase = int(env.phase) if env.phase <= env.phaselen else 0
+            cols["aslip_ref_lpos"][n] = env.trajectory.lpos[phase][0:3]
+            cols["aslip_ref_rpos"][n] = env.trajectory.rpos[phase][0:3]
+            cols["aslip_ref_cvel"][n] = env.trajectory.cvel[phase][0:3]
+        self._chunks[-1] = (cols, n + 1)
+
+    # All recorded rows, single width columns flattened to 1d
+    def columns(self):
+        out = {}
+        for name in self._chunks[0][0]:
+            col = np.concatenate([cols[name][:n] for cols, n in self._chunks])
+            out[name] = col[:, 0] if col.shape[1] == 1 else col
+        return out
+
+    def save(self, path):
+        np.savez(path, **self.columns())
+
+# Columns of one or more files saved by RewardRecorder.save, concatenated
+def load_columns(paths):
+    if isinstance(paths, str):
+        paths = [paths]
+    files = [np.load(path) for path in paths]
+    names = set(files[0].files).intersection(*[f.files for f in files[1:]])
+    return {name: np.concatenate([f[name] for f in files]) for name in names}
+
+# Left and right clock values of a clock reward variant at every row
+def clock_values(clock_funcs_file, cols, per_speed):
+    clock_funcs = load_clock_tables(os.path.join(clock_funcs_dir, clock_funcs_file))
+    phase = cols["phase"]
+    if not per_speed:
+        return clock_funcs["left"][-1](phase), clock_funcs["right"][-1](phase)
+    left, right = np.zeros(len(phase)), np.zeros(len(phase))
+    traj_idx = cols["traj_idx"].astype(int)
+    for i in np.unique(traj_idx):
+        rows = traj_idx == i
+        left[rows] = clock_funcs["left"][i](phase[rows])
+        right[rows] = clock_funcs["right"][i](phase[rows])
+    return left, right
+
+def _deadzone(x, width):
+    return np.where(x < width, 0, x)
+
+def _straight_diff(qpos):
+    return _deadzone(np.abs(qpos[:, 1]), 0.05) + _deadzone(np.abs(qpos[:, 2] - 1.0), 0.2)
+
+def _clock_penalties(cols, clocks, max_frc, max_vel):
+    left, right = clocks
+    normed_left_vel = np.linalg.norm(cols["l_foot_vel"], axis=1) / max_vel
+    normed_right_vel = np.linalg.norm(cols["r_foot_vel"], axis=1) / max_vel
+    foot_frc_penalty = np.tanh(left * cols["l_foot_frc"] / max_frc) + np.tanh(right * cols["r_foot_frc"] / max_frc)
+    foot_vel_penalty = np.tanh(-left * normed_left_vel) + np.tanh(-right * normed_right_vel)
+    return foot_frc_penalty, foot_vel_penalty
+
+def clock_batch(cols, clocks):
+    qpos = cols["qpos"]
+    com_orient_error = 1 - qpos[:, 3] ** 2
+    foot_orient_error = cols["l_foot_orient_cost"] + cols["r_foot_orient_cost"]
+    com_vel_error = np.abs(cols["qvel"][:, 0] - cols["speed"])
+    foot_frc_penalty, foot_vel_penalty = _clock_penalties(cols, clocks, 400, 3.0)
+    return 0.1 * np.exp(-com_orient_error) + \
+           0.1 * np.exp(-foot_orient_error) + \
+           0.2 * np.exp(-com_vel_error) + \
+           0.1 * np.exp(-_straight_diff(qpos)) + \
+           0.25 * foot_frc_penalty + \
+           0.25 * foot_vel_penalty
+
+def max_vel_clock_batch(cols, clocks):
+    qpos = cols["qpos"]
+    com_orient_error = 15 * (1 - qpos[:, 3] ** 2)
+    foot_orient_error = cols["l_foot_orient_cost"] + cols["r_foot_orient_cost"]
+    com_vel_bonus = cols["qvel"][:, 0] / 3.0
+    foot_frc_penalty, foot_vel_penalty = _clock_penalties(cols, clocks, 400, 2.0)
+    return 0.1 * np.exp(-com_orient_error) + \
+           0.1 * np.exp(-foot_orient_error) + \
+           0.1 * np.exp(-_straight_diff(qpos)) + \
+           0.2 * foot_frc_penalty + \
+           0.2 * foot_vel_penalty + \
+           0.3 * com_vel_bonus
+
+def aslip_clock_batch(cols, clocks):
+    qpos = cols["qpos"]
+    com_orient_error = 1 - qpos[:, 3] ** 2
+    foot_orient_error = cols["l_foot_orient_cost"] + cols["r_foot_orient_cost"]
+    foot_pos_error = np.abs(cols["l_foot_pos"][:, 0:2] - cols["aslip_ref_lpos"][:, 0:2]).sum(axis=1) + \
+                     np.abs(cols["r_foot_pos"][:, 0:2] - cols["aslip_ref_rpos"][:, 0:2]).sum(axis=1)
+    com_vel_error = np.abs(cols["qvel"][:, 0:3] - cols["aslip_ref_cvel"]).sum(axis=1)
+    foot_frc_penalty, foot_vel_penalty = _clock_penalties(cols, clocks, 400, 2.0)
+    return 0.05 * np.exp(-com_orient_error) + \
+           0.05 * np.exp(-foot_orient_error) + \
+           0.2 * np.exp(-foot_pos_error) + \
+           0.2 * np.exp(-com_vel_error) + \
+           0.1 * np.exp(-_straight_diff(qpos)) + \
+           0.2 * foot_frc_penalty + \
+           0.2 * foot_vel_penalty
+
+def aslip_old_batch(cols, clocks):
+    footpos_error = np.abs(cols["est_l_foot_pos"] - cols["aslip_ref_lpos"]).sum(axis=1) + \
+                    np.abs(cols["est_r_foot_pos"] - cols["aslip_ref_rpos"]).sum(axis=1)
+    com_vel_error = np.abs(cols["est_com_vel"] - cols["aslip_ref_cvel"]).sum(axis=1)
+    action_penalty = np.linalg.norm(cols["action"] - cols["prev_action"], axis=1)
+    foot_orient_penalty = cols["l_foot_orient_cost"] + cols["r_foot_orient_cost"]
+    straight_diff = _deadzone(np.abs(cols["qpos"][:, 1]), 0.05)
+    return 0.3 * np.exp(-footpos_error) + \
+           0.3 * np.exp(-com_vel_error) + \
+           0.1 * np.exp(-action_penalty) + \
+           0.2 * np.exp(-foot_orient_penalty) + \
+           0.1 * np.exp(-straight_diff)
+
+# joint_weight and term_weight can be overridden to try out other weightings
+def iros_paper_batch(cols, clocks, pos_idx=(7, 8, 9, 14, 20, 21, 22, 23, 28, 34), joint_weight=None, term_weight=None):
+    if joint_weight is None:
+        joint_weight = [0.15, 0.15, 0.1, 0.05, 0.05, 0.15, 0.15, 0.1, 0.05, 0.05]
+    if term_weight is None:
+        term_weight = [0.5, 0.3, 0.1, 0.1]
+    idx = np.array(list(pos_idx) + [0, 1, 2] + [4, 5, 6] + [15, 29])
+    weight = np.concatenate([30 * np.asarray(joint_weight), np.ones(3), np.ones(3), np.full(2, 1000.0)])
+    terms = np.array([0, len(pos_idx), len(pos_idx) + 3, len(pos_idx) + 6])
+    err = cols["ref_pos"][:, idx] - cols["qpos"][:, idx]
+    return np.exp(-np.add.reduceat(weight * err * err, terms, axis=1)) @ np.asarray(term_weight)
+
+def old_speed_batch(cols, clocks):
+    qpos, qvel = cols["qpos"], cols["qvel"]
+    diff = _deadzone(np.abs(qvel[:, 0] - cols["speed"]), 0.05)
+    orient_diff = np.linalg.norm(qpos[:, 3:7] - np.array([1.0, 0, 0, 0]), axis=1)
+    y_vel = _deadzone(np.abs(qvel[:, 1]), 0.03)
+    straight_diff = _deadzone(np.abs(qpos[:, 1]), 0.05)
+    return .5*np.exp(-diff) + .15*np.exp(-orient_diff) + .1*np.exp(-y_vel) + .25 * np.exp(-straight_diff)
+
+batch_rewards = {
+    "clock":           clock_batch,
+    "max_vel_clock":   max_vel_clock_batch,
+    "aslip_clock":     aslip_clock_batch,
+    "aslip_old":       aslip_old_batch,
+    "iros_paper":      iros_paper_batch,
+    "5k_speed_reward": old_speed_batch,
+}
+
+# Reward of every recorded row under the given reward argument (a registry name
+# or a clock variant such as "clock_strict0.4"). Extra keyword arguments go to
+# the batch kernel.
+def evaluate_reward(cols, name, **kwargs):
+    reward_name, clock_funcs_file = clock_reward_variant(name)
+    if reward_name not in batch_rewards:
+        raise NotImplementedError("unknown reward function {}".format(name))
+    clocks = None
+    if clock_funcs_file is not None:
+        clocks = clock_values(clock_funcs_file, cols, per_speed=reward_name == "aslip_clock")
+    return batch_rewards[reward_name](cols, clocks, **kwargs)
@@ -1,8 +1,8 @@
 import numpy as np
 
 def jonah_RNN_reward(self):
-    qpos = np.copy(self.sim.qpos())
-    qvel = np.copy(self.sim.qvel())
+    qpos = self.sim.qpos()
+    qvel = self.sim.qvel()
 
     ref_pos, ref_vel = self.get_ref_state(self.phase)
     
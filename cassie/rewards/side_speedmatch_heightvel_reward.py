@@ -1,8 +1,8 @@
 import numpy as np
 
 def side_speedmatch_heightvel_reward(self):
-    qpos = np.copy(self.sim.qpos())
-    qvel = np.copy(self.sim.qvel())
+    qpos = self.sim.qpos()
+    qvel = self.sim.qvel()
     
     forward_diff = np.abs(qvel[0] -self.speed)
     orient_diff = np.linalg.norm(qpos[3:7] - np.array([1, 0, 0, 0]))
@@ -1,8 +1,8 @@
 import numpy as np
 
 def side_speedmatch_reward(self):
-    qpos = np.copy(self.sim.qpos())
-    qvel = np.copy(self.sim.qvel())
+    qpos = self.sim.qpos()
+    qvel = self.sim.qvel()
     
     forward_diff = np.abs(qvel[0] -self.speed)
     orient_diff = np.linalg.norm(qpos[3:7] - np.array([1, 0, 0, 0]))
@@ -17,8 +17,8 @@ def side_speedmatch_reward(self):
     return reward
 
 def side_speedmatch_torquesmooth_reward(self):
-    qpos = np.copy(self.sim.qpos())
-    qvel = np.copy(self.sim.qvel())
+    qpos = self.sim.qpos()
+    qvel = self.sim.qvel()
     
     forward_diff = np.abs(qvel[0] -self.speed)
     orient_diff = np.linalg.norm(qpos[3:7] - np.array([1, 0, 0, 0]))
@@ -34,8 +34,8 @@ def side_speedmatch_torquesmooth_reward(self):
     return reward
 
 def side_speedmatch_foottraj_reward(self):
-    qpos = np.copy(self.sim.qpos())
-    qvel = np.copy(self.sim.qvel())
+    qpos = self.sim.qpos()
+    qvel = self.sim.qvel()
     
     forward_diff = np.abs(qvel[0] -self.speed)
     orient_diff = np.linalg.norm(qpos[3:7] - np.array([1, 0, 0, 0]))
@@ -53,8 +53,8 @@ def side_speedmatch_foottraj_reward(self):
     return reward
 
 def side_speedmatch_heightvel_reward(self):
-    qpos = np.copy(self.sim.qpos())
-    qvel = np.copy(self.sim.qvel())
+    qpos = self.sim.qpos()
+    qvel = self.sim.qvel()
     
     forward_diff = np.abs(qvel[0] -self.speed)
     orient_diff = np.linalg.norm(qpos[3:7] - np.array([1, 0, 0, 0]))
@@ -72,8 +72,8 @@ def side_speedmatch_heightvel_reward(self):
     return reward
 
 def side_speedmatch_heuristic_reward(self):
-    qpos = np.copy(self.sim.qpos())
-    qvel = np.copy(self.sim.qvel())
+    qpos = self.sim.qpos()
+    qvel = self.sim.qvel()
     
     forward_diff = np.abs(qvel[0] -self.speed)
     orient_diff = np.linalg.norm(qpos[3:7] - np.array([1, 0, 0, 0]))
@@ -1,8 +1,8 @@
 import numpy as np
 
 def speedmatch_footorient_joint_smooth_reward(self):
-    qpos = np.copy(self.sim.qpos())
-    qvel = np.copy(self.sim.qvel())
+    qpos = self.sim.qpos()
+    qvel = self.sim.qvel()
     
     orient_targ = np.array([1, 0, 0, 0])
     speed_targ = np.array([self.speed, 0, 0])
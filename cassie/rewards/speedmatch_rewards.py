@@ -1,8 +1,8 @@
 import numpy as np
 
 def speedmatch_reward(self):
-    qpos = np.copy(self.sim.qpos())
-    qvel = np.copy(self.sim.qvel())
+    qpos = self.sim.qpos()
+    qvel = self.sim.qvel()
     orient_targ = np.array([1, 0, 0, 0])
     speed_targ = np.array([self.speed, 0, 0])
     if self.time >= self.orient_time:
@@ -34,8 +34,8 @@ def speedmatch_reward(self):
     return reward
 
 def old_speed_reward(self):
-    qpos = np.copy(self.sim.qpos())
-    qvel = np.copy(self.sim.qvel())
+    qpos = self.sim.qpos()
+    qvel = self.sim.qvel()
     diff = np.abs(qvel[0] - self.speed)
     orient_diff = np.linalg.norm(qpos[3:7] - np.array([1, 0, 0, 0]))
     y_vel = np.abs(qvel[1])
@@ -52,8 +52,8 @@ def old_speed_reward(self):
     return reward
 
 def old_speed_footorient_reward(self):
-    qpos = np.copy(self.sim.qpos())
-    qvel = np.copy(self.sim.qvel())
+    qpos = self.sim.qpos()
+    qvel = self.sim.qvel()
     diff = np.abs(qvel[0] - self.speed)
     orient_diff = np.linalg.norm(qpos[3:7] - np.array([1, 0, 0, 0]))
     y_vel = np.abs(qvel[1])
@@ -76,8 +76,8 @@ def old_speed_footorient_reward(self):
     return reward
 
 def speedmatch_footheightvelflag_reward(self):
-    qpos = np.copy(self.sim.qpos())
-    qvel = np.copy(self.sim.qvel())
+    qpos = self.sim.qpos()
+    qvel = self.sim.qvel()
     orient_targ = np.array([1, 0, 0, 0])
     speed_targ = np.array([self.speed, 0, 0])
     forward_diff = np.abs(qvel[0] - speed_targ[0])
@@ -103,8 +103,8 @@ def speedmatch_footheightvelflag_reward(self):
     return reward
 
 def speedmatch_footheightvelflag_even_reward(self):
-    qpos = np.copy(self.sim.qpos())
-    qvel = np.copy(self.sim.qvel())
+    qpos = self.sim.qpos()
+    qvel = self.sim.qvel()
     orient_targ = np.array([1, 0, 0, 0])
     speed_targ = np.array([self.speed, 0, 0])
     forward_diff = np.abs(qvel[0] - speed_targ[0])
@@ -130,8 +130,8 @@ def speedmatch_footheightvelflag_even_reward(self):
     return reward
 
 def speedmatch_footheightsmooth_footorient_reward(self):
-    qpos = np.copy(self.sim.qpos())
-    qvel = np.copy(self.sim.qvel())
+    qpos = self.sim.qpos()
+    qvel = self.sim.qvel()
     orient_targ = np.array([1, 0, 0, 0])
     speed_targ = np.array([self.speed, 0, 0])
     forward_diff = np.abs(qvel[0] - speed_targ[0])
@@ -158,8 +158,8 @@ def speedmatch_footheightsmooth_footorient_reward(self):
     return reward
 
 def speedmatch_footheightvelflag_even_footorient_reward(self):
-    qpos = np.copy(self.sim.qpos())
-    qvel = np.copy(self.sim.qvel())
+    qpos = self.sim.qpos()
+    qvel = self.sim.qvel()
     orient_targ = np.array([1, 0, 0, 0])
     speed_targ = np.array([self.speed, 0, 0])
     forward_diff = np.abs(qvel[0] - speed_targ[0])
@@ -186,8 +186,8 @@ def speedmatch_footheightvelflag_even_footorient_reward(self):
     return reward
 
 def speedmatch_footheightvelflag_even_footorient_footdist_reward(self):
-    qpos = np.copy(self.sim.qpos())
-    qvel = np.copy(self.sim.qvel())
+    qpos = self.sim.qpos()
+    qvel = self.sim.qvel()
     orient_targ = np.array([1, 0, 0, 0])
     speed_targ = np.array([self.speed, 0, 0])
     forward_diff = np.abs(qvel[0] - speed_targ[0])
@@ -223,8 +223,8 @@ def speedmatch_footheightvelflag_even_footorient_footdist_reward(self):
     return reward
 
 def speedmatch_footheightvelflag_even_footorient_footdist_torquecost_reward(self):
-    qpos = np.copy(self.sim.qpos())
-    qvel = np.copy(self.sim.qvel())
+    qpos = self.sim.qpos()
+    qvel = self.sim.qvel()
     orient_targ = np.array([1, 0, 0, 0])
     speed_targ = np.array([self.speed, 0, 0])
     forward_diff = np.abs(qvel[0] - speed_targ[0])
@@ -260,8 +260,8 @@ def speedmatch_footheightvelflag_even_footorient_footdist_torquecost_reward(self
     return reward
 
 def speedmatch_footheightvelflag_even_footorient_footdist_torquecost_smooth_reward(self):
-    qpos = np.copy(self.sim.qpos())
-    qvel = np.copy(self.sim.qvel())
+    qpos = self.sim.qpos()
+    qvel = self.sim.qvel()
     orient_targ = np.array([1, 0, 0, 0])
     speed_targ = np.array([self.speed, 0, 0])
     forward_diff = np.abs(qvel[0] - speed_targ[0])
@@ -297,8 +297,8 @@ def speedmatch_footheightvelflag_even_footorient_footdist_torquecost_smooth_rewa
     return reward
 
 def speedmatch_footheightvelflag_even_footorient_smooth_reward(self):
-    qpos = np.copy(self.sim.qpos())
-    qvel = np.copy(self.sim.qvel())
+    qpos = self.sim.qpos()
+    qvel = self.sim.qvel()
     orient_targ = np.array([1, 0, 0, 0])
     speed_targ = np.array([self.speed, 0, 0])
     forward_diff = np.abs(qvel[0] - speed_targ[0])
@@ -326,8 +326,8 @@ def speedmatch_footheightvelflag_even_footorient_smooth_reward(self):
     return reward
 
 def speedmatch_footheightvelflag_even_capzvel_reward(self):
-    qpos = np.copy(self.sim.qpos())
-    qvel = np.copy(self.sim.qvel())
+    qpos = self.sim.qpos()
+    qvel = self.sim.qvel()
     orient_targ = np.array([1, 0, 0, 0])
     speed_targ = np.array([self.speed, 0, 0])
     forward_diff = np.abs(qvel[0] - speed_targ[0])
@@ -361,8 +361,8 @@ def speedmatch_footheightvelflag_even_capzvel_reward(self):
 
 
 def speedmatch_footorient_reward(self):
-    qpos = np.copy(self.sim.qpos())
-    qvel = np.copy(self.sim.qvel())
+    qpos = self.sim.qpos()
+    qvel = self.sim.qvel()
     orient_targ = np.array([1, 0, 0, 0])
     speed_targ = np.array([self.speed, 0, 0])
     if self.time >= self.orient_time:
@@ -395,8 +395,8 @@ def speedmatch_footorient_reward(self):
     return reward
 
 def speedmatch_footorient_joint_smooth_reward(self):
-    qpos = np.copy(self.sim.qpos())
-    qvel = np.copy(self.sim.qvel())
+    qpos = self.sim.qpos()
+    qvel = self.sim.qvel()
     
     orient_targ = np.array([1, 0, 0, 0])
     speed_targ = np.array([self.speed, 0, 0])
@@ -432,8 +432,8 @@ def speedmatch_footorient_joint_smooth_reward(self):
     return reward
 
 def speedmatch_footorient_footheightvel_smooth_reward(self):
-    qpos = np.copy(self.sim.qpos())
-    qvel = np.copy(self.sim.qvel())
+    qpos = self.sim.qpos()
+    qvel = self.sim.qvel()
     
     orient_targ = np.array([1, 0, 0, 0])
     speed_targ = np.array([self.speed, 0, 0])
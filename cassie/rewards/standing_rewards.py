@@ -1,8 +1,8 @@
 import numpy as np
 
 def stand_reward(self):
-    qpos = np.copy(self.sim.qpos())
-    qvel = np.copy(self.sim.qvel())
+    qpos = self.sim.qpos()
+    qvel = self.sim.qvel()
 
     com_vel = np.linalg.norm(qvel[0:3])
     com_height = (0.9 - qpos[2]) ** 2
@@ -12,8 +12,8 @@ def stand_reward(self):
     return reward
 
 def step_even_reward(self):
-    qpos = np.copy(self.sim.qpos())
-    qvel = np.copy(self.sim.qvel())
+    qpos = self.sim.qpos()
+    qvel = self.sim.qvel()
 
     com_vel = np.linalg.norm(qvel[0:3])
     com_height = (0.9 - qpos[2]) ** 2
@@ -24,8 +24,8 @@ def step_even_reward(self):
     return reward
 
 def step_even_pelheight_reward(self):
-    qpos = np.copy(self.sim.qpos())
-    qvel = np.copy(self.sim.qvel())
+    qpos = self.sim.qpos()
+    qvel = self.sim.qvel()
 
     com_height = (0.9 - qpos[2]) ** 2
     if qpos[2] > 0.8:
@@ -37,8 +37,8 @@ def step_even_pelheight_reward(self):
     return reward
 
 def step_smooth_pelheight_reward(self):
-    qpos = np.copy(self.sim.qpos())
-    qvel = np.copy(self.sim.qvel())
+    qpos = self.sim.qpos()
+    qvel = self.sim.qvel()
 
     com_height = (0.9 - qpos[2]) ** 2
     if qpos[2] > 0.8:
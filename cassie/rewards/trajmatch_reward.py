@@ -1,8 +1,8 @@
 import numpy as np
 
 def trajmatch_reward(self):
-    qpos = np.copy(self.sim.qpos())
-    qvel = np.copy(self.sim.qvel())
+    qpos = self.sim.qpos()
+    qvel = self.sim.qvel()
     phase_diff = self.phase - np.floor(self.phase)
     ref_pos_prev, ref_vel_prev = self.get_ref_state(int(np.floor(self.phase)))
     if phase_diff != 0:
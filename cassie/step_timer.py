@@ -0,0 +1,70 @@
+import os
+import time
+from functools import wraps
+
+# Optional timing of the sections of env.step. When enabled (the env's
+# step_timing flag, or CASSIE_STEP_TIMING=1 in the environment) the env's
+# section methods are replaced on the instance by timed wrappers, so a disabled
+# timer costs nothing per step. Times are exclusive: a section nested in
+# another (e.g. set_pd_input inside step_simulation_n) is only counted under
+# its own name, and "step" is whatever step() spends outside every section.
+def step_timing_enabled(flag=False):
+    return flag or os.environ.get("CASSIE_STEP_TIMING", "0") not in ("", "0")
+
+class StepTimer:
+    def __init__(self):
+        self.times = {}
+        self.calls = {}
+        self._children = []   # time spent in nested sections, per open section
+
+    # Wrap the given methods of env (method name -> section name), skipping any it doesn't have
+    def instrument(self, env, sections):
+        for method, name in sections.items():
+            if hasattr(env, method):
+                setattr(env, method, self.wrap(name, getattr(env, method)))
+
+    def wrap(self, name, fn):
+        self.times.setdefault(name, 0.0)
+        self.calls.setdefault(name, 0)
+        times, calls, children = self.times, self.calls, self._children
+        perf_counter = time.perf_counter
+
+        @wraps(fn)
+        def timed(*args, **kwargs):
+            children.append(0.0)
+            start = perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = perf_counter() - start
+                times[name] += elapsed - children.pop()
+                calls[name] += 1
+                if children:
+                    children[-1] += elapsed
+        return timed
+
+    def reset(self):
+        for name in self.times:
+            self.times[name] = 0.0
+            self.calls[name] = 0
+
+    # section -> {"time": total seconds, "calls": count}
+    def stats(self):
+        return {name: {"time": self.times[name], "calls": self.calls[name]} for name in self.times}
+
+# Sum the perf_stats() of several envs
+def merge_perf_stats(stats_list):
+    merged = {}
+    for stats in stats_list:
+        for name, s in stats.items():
+            m = merged.setdefault(name, {"time": 0.0, "calls": 0})
+            m["time"] += s["time"]
+            m["calls"] += s["calls"]
+    return merged
+
+# Average microseconds per env step spent in each section
+def per_step_us(stats):
+    steps = stats.get("step", {}).get("calls", 0)
+    if steps == 0:
+        return {}
+    return {name: s["time"] / steps * 1e6 for name, s in stats.items()}
@@ -1,33 +1,5 @@
 import numpy as np
-import pickle, os
-
-import torch
-import torch.nn as nn
-import torch.functional as F
-
-class IKNet(nn.Module):
-    def __init__(self, input_size, output_size, hidden_layer_sizes):
-        super(IKNet, self).__init__()
-
-        self.layers = nn.ModuleList()
-        
-        self.layers += [nn.Linear(input_size, hidden_layer_sizes[0])]
-        
-        for i in range(len(hidden_layer_sizes)-1):
-            self.layers += [nn.Linear(hidden_layer_sizes[i], hidden_layer_sizes[i+1])]
-        
-        self.nonlinearity = torch.relu
-        
-        self.out = nn.Linear(hidden_layer_sizes[-1], output_size)
-
-        # print("# of params: ", sum(p.numel() for p in self.parameters()))
-    
-    def forward(self, inputs):
-        x = inputs
-        for layer in self.layers:
-            x = self.nonlinearity(layer(x))
-        x = self.out(x)
-        return x
+import pickle, os, hashlib
 
 """
 Aslip-IK trajectories, for several speeds
@@ -42,24 +14,86 @@ and using that as the input to the network.
 def getAllTrajectories(speeds):
     trajectories = []
 
-    dirname = os.path.dirname(__file__)
-
-    model = IKNet(9, 35, (15, 15))
-    model.load_state_dict(torch.load(os.path.join(dirname, "ikNet_state_dict.pt")))
+    # ik_pos of each trajectory is computed (or read from the cache) the first
+    # time it is used
+    expander = IKExpander()
 
     for i, speed in enumerate(speeds):
         dirname = os.path.dirname(__file__)
-        traj_path = os.path.join(dirname, "aslipTrajsTaskSpace", "walkCycle_{}.pkl".format(speed))
+        # flat binary version written by tools/convert_aslip_trajs.py if there is one
+        traj_path = os.path.join(dirname, "aslipTrajsTaskSpace", "walkCycle_{}.bin".format(speed))
+        if not os.path.exists(traj_path):
+            traj_path = os.path.join(dirname, "aslipTrajsTaskSpace", "walkCycle_{}.pkl".format(speed))
         trajectory = CassieAslipTrajectory(traj_path)
-        time = np.linspace(0, trajectory.time[-1], num=50*trajectory.length)
-        x = trajectory.pos_f_interp(time).T
-        ik_pos = model(torch.Tensor(x)).detach().numpy()
-        trajectory.ik_pos = ik_pos
+        trajectory.ik_expander = expander
         trajectories.append(trajectory)
 
     # print("Got all trajectories")
     return trajectories
 
+def _file_digest(path):
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+# Runs the IK net over a trajectory's task space positions, upsampled in time,
+# to get its joint positions (ik_pos). Results are saved as .npy files in
+# ik_cache_dir (CASSIE_IK_CACHE to override), keyed by a hash of the IK net
+# weights, the trajectory file and the upsample factor, so the net only runs
+# the first time a trajectory is used and the cached arrays are memory mapped
+# after that.
+ik_upsample = 50
+ik_cache_dir = os.path.join(os.path.dirname(__file__), "ikCache")
+
+class IKExpander:
+    def __init__(self, upsample=ik_upsample, cache_dir=None):
+        dirname = os.path.dirname(__file__)
+        self.weights_path = os.path.join(dirname, "ikNet_state_dict.pt")
+        self.weights_digest = _file_digest(self.weights_path)
+        self.upsample = upsample
+        self.cache_dir = cache_dir or os.environ.get("CASSIE_IK_CACHE", ik_cache_dir)
+        self.model = None
+
+    def cache_path(self, trajectory):
+        key = hashlib.sha1()
+        key.update(self.weights_digest.encode())
+        key.update(_file_digest(trajectory.filepath).encode())
+        key.update(str(self.upsample).encode())
+        name = os.path.splitext(os.path.basename(trajectory.filepath))[0]
+        return os.path.join(self.cache_dir, "{}_{}.npy".format(name, key.hexdigest()[:16]))
+
+    def __call__(self, trajectory):
+        path = self.cache_path(trajectory)
+        if os.path.exists(path):
+            try:
+                return np.load(path, mmap_mode="r")
+            except (OSError, ValueError):
+                print("Could not read cached IK positions {}, recomputing".format(path))
+
+        ik_pos = self.expand(trajectory)
+        # written under a temporary name and renamed, so that envs building the
+        # same cache in parallel never read a partial file
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = "{}.{}.tmp".format(path, os.getpid())
+            with open(tmp_path, "wb") as f:
+                np.save(f, ik_pos)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print("Could not cache IK positions to {}: {}".format(path, e))
+        return ik_pos
+
+    def expand(self, trajectory):
+        # torch is only needed here, so it isn't imported with the package
+        import torch
+        if self.model is None:
+            from .iknet import IKNet
+            self.model = IKNet(9, 35, (15, 15))
+            self.model.load_state_dict(torch.load(self.weights_path))
+        time = np.linspace(0, trajectory.time[-1], num=self.upsample*trajectory.length)
+        x = trajectory.pos_f_interp(time).T
+        with torch.no_grad():
+            return self.model(torch.Tensor(x)).numpy()
+
 # # return list of 1-d interp curves parameterized by each trajectory's length
 # def aslip_interp(trajectories, simrate):
 #     from scipy.interpolate import interp1d
@@ -76,23 +110,86 @@ def getAllTrajectories(speeds):
 
 
 
+# Flat binary aslip trajectory: all float64, a header of [length, number of
+# interpolation knots, qpos width, qvel width] followed by the fields below
+# (length rows each) and the task space interpolation knots and values. Loaded
+# with np.memmap, so processes on a node share one read-only copy.
+aslip_fields = ["time", "qpos", "qvel", "rpos", "rvel", "lpos", "lvel", "cpos", "cvel"]
+
+def _aslip_widths(nq, nv):
+    return {"time": 1, "qpos": nq, "qvel": nv, "rpos": 3, "rvel": 3, "lpos": 3, "lvel": 3, "cpos": 3, "cvel": 3}
+
+def save_aslip_binary(trajectory, path):
+    interp = trajectory["pos_f_interp"]
+    length, nq = trajectory["qpos"].shape
+    nv = trajectory["qvel"].shape[1]
+    header = np.array([length, len(interp.x), nq, nv], dtype=np.double)
+    parts = [header] + [np.asarray(trajectory[name], dtype=np.double).ravel() for name in aslip_fields]
+    parts += [np.asarray(interp.x, dtype=np.double), np.asarray(interp.y, dtype=np.double).ravel()]
+    np.concatenate(parts).tofile(path)
+
+def load_aslip_binary(path):
+    data = np.asarray(np.memmap(path, dtype=np.double, mode="r"))
+    length, knots, nq, nv = data[0:4].astype(int)
+    trajectory = {}
+    offset = 4
+    for name, width in _aslip_widths(nq, nv).items():
+        trajectory[name] = data[offset:offset + length * width].reshape((length, width) if name != "time" else (length,))
+        offset += length * width
+    x = data[offset:offset + knots]
+    y = data[offset + knots:offset + knots * 10].reshape((9, knots))
+    trajectory["pos_f_interp"] = LinearInterp(x, y)
+    return trajectory
+
+# Stand-in for the pickled scipy interp1d (linear, along the last axis) of the
+# task space positions [rpos, lpos, cpos]
+class LinearInterp:
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+    def __call__(self, t):
+        t = np.asarray(t)
+        if np.any(t < self.x[0]) or np.any(t > self.x[-1]):
+            raise ValueError("A value in x_new is outside the interpolation range.")
+        return np.stack([np.interp(t, self.x, row) for row in self.y])
+
 class CassieAslipTrajectory:
     def __init__(self, filepath):
-        with open(filepath, "rb") as f:
-            trajectory = pickle.load(f)
-
-        self.qpos = np.copy(trajectory["qpos"])
-        self.qvel = np.copy(trajectory["qvel"])
-        self.rpos = np.copy(trajectory["rpos"])
-        self.rvel = np.copy(trajectory["rvel"])
-        self.lpos = np.copy(trajectory["lpos"])
-        self.lvel = np.copy(trajectory["lvel"])
-        self.cpos = np.copy(trajectory["cpos"])
-        self.cvel = np.copy(trajectory["cvel"])
+        self.filepath = filepath
+        if filepath.endswith(".bin"):
+            # read-only views into the mapped file, no copies
+            trajectory = load_aslip_binary(filepath)
+            copy = np.asarray
+        else:
+            with open(filepath, "rb") as f:
+                trajectory = pickle.load(f)
+            copy = np.copy
+
+        self.qpos = copy(trajectory["qpos"])
+        self.qvel = copy(trajectory["qvel"])
+        self.rpos = copy(trajectory["rpos"])
+        self.rvel = copy(trajectory["rvel"])
+        self.lpos = copy(trajectory["lpos"])
+        self.lvel = copy(trajectory["lvel"])
+        self.cpos = copy(trajectory["cpos"])
+        self.cvel = copy(trajectory["cvel"])
         self.length = self.qpos.shape[0]
-        self.time = np.copy(trajectory["time"])
+        self.time = copy(trajectory["time"])
         self.pos_f_interp = trajectory["pos_f_interp"]
-        self.ik_pos = None
+        self.ik_expander = None
+        self._ik_pos = None
+
+    # Upsampled IK joint positions, filled in by the IKExpander on first use
+    @property
+    def ik_pos(self):
+        if self._ik_pos is None and self.ik_expander is not None:
+            self._ik_pos = self.ik_expander(self)
+        return self._ik_pos
+
+    @ik_pos.setter
+    def ik_pos(self, ik_pos):
+        self._ik_pos = ik_pos
 
 
 # delta position : difference between desired taskspace position and current position.
@@ -0,0 +1,26 @@
+import torch
+import torch.nn as nn
+
+class IKNet(nn.Module):
+    def __init__(self, input_size, output_size, hidden_layer_sizes):
+        super(IKNet, self).__init__()
+
+        self.layers = nn.ModuleList()
+        
+        self.layers += [nn.Linear(input_size, hidden_layer_sizes[0])]
+        
+        for i in range(len(hidden_layer_sizes)-1):
+            self.layers += [nn.Linear(hidden_layer_sizes[i], hidden_layer_sizes[i+1])]
+        
+        self.nonlinearity = torch.relu
+        
+        self.out = nn.Linear(hidden_layer_sizes[-1], output_size)
+
+        # print("# of params: ", sum(p.numel() for p in self.parameters()))
+    
+    def forward(self, inputs):
+        x = inputs
+        for layer in self.layers:
+            x = self.nonlinearity(layer(x))
+        x = self.out(x)
+        return x
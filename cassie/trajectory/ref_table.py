@@ -0,0 +1,77 @@
+import numpy as np
+from math import floor
+
+# Reference states of a trajectory at each phase, precomputed once per
+# (trajectory file, simrate) and shared by every env in the process.
+#
+# The per-phase rows are read-only. The pelvis x position is the only value
+# that depends on speed and the cycle counter, and that is applied as an
+# affine update when a full state is requested. The tables keep every row of
+# the trajectory and a phase reads row int(phase * simrate) (int(phase) for
+# the aslip trajectories), as get_ref_state always did, so fractional phases
+# (phase_add != 1) get the exact trajectory sample rather than an
+# interpolation between phase rows.
+_ref_tables = {}
+
+def get_ref_table(trajectory, simrate, aslip, pos_idx, pos_index, vel_index):
+    key = (trajectory.filepath, simrate, aslip, tuple(pos_idx), tuple(pos_index), tuple(vel_index))
+    table = _ref_tables.get(key)
+    if table is None:
+        table = _ref_tables[key] = RefTable(trajectory, simrate, aslip, pos_idx, pos_index, vel_index)
+    return table
+
+class RefTable:
+    def __init__(self, trajectory, simrate, aslip, pos_idx, pos_index, vel_index):
+        self.aslip = aslip
+        # trajectory rows per phase
+        self.rows_per_phase = 1 if aslip else simrate
+        self.phaselen = trajectory.length - 1 if aslip else floor(len(trajectory) / simrate) - 1
+
+        # x distance covered in one cycle
+        self.x_step = trajectory.qpos[-1, 0] - trajectory.qpos[0, 0]
+
+        self.qpos = np.array(trajectory.qpos)
+        self.qpos[:, 1] = 0     # lateral target is always 0
+        self.qvel = np.array(trajectory.qvel)
+
+        # motor positions (pd offsets)
+        self.motor_pos_table = self.qpos[:, pos_idx]
+        self.motor_pos_table.flags.writeable = False
+        self.qpos.flags.writeable = False
+        self.qvel.flags.writeable = False
+
+        # reference part of the observation. Only used with the full state
+        # trajectories, the aslip ones don't store a full qvel.
+        if not aslip:
+            self.ext_table = np.hstack((self.qpos[:, pos_index], self.qvel[:, vel_index]))
+            self.ext_table.flags.writeable = False
+            # pelvis x velocity in the observation, scaled by speed
+            self.ext_vel_x = len(pos_index) + list(vel_index).index(0) if 0 in vel_index else None
+
+    def _row(self, table, phase):
+        if phase > self.phaselen:
+            phase = 0
+        return table[int(phase * self.rows_per_phase)]
+
+    # Full reference qpos/qvel (copies), same as CassieEnv_v2.get_ref_state
+    def state(self, phase, speed, counter):
+        pos = np.array(self._row(self.qpos, phase))
+        vel = np.array(self._row(self.qvel, phase))
+        if not self.aslip:
+            pos[0] *= speed
+            pos[0] += self.x_step * counter * speed
+            vel[0] *= speed
+        else:
+            pos[0] += self.x_step * counter
+        return pos, vel
+
+    # Reference motor positions, read-only
+    def motor_pos(self, phase):
+        return self._row(self.motor_pos_table, phase)
+
+    # Reference qpos[pos_index] and qvel[vel_index], concatenated
+    def ext_state(self, phase, speed):
+        ext = np.array(self._row(self.ext_table, phase))
+        if self.ext_vel_x is not None:
+            ext[self.ext_vel_x] *= speed
+        return ext
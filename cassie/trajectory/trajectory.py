@@ -7,7 +7,10 @@ Agility 2 kHz trajectory
 class CassieTrajectory:
     def __init__(self, filepath):
         n = 1 + 35 + 32 + 10 + 10 + 10
-        data = np.fromfile(filepath, dtype=np.double).reshape((-1, n))
+        self.filepath = filepath
+        # mapped read-only rather than read, so every process on a node shares
+        # the page cache copy of the file instead of holding its own
+        data = np.asarray(np.memmap(filepath, dtype=np.double, mode="r")).reshape((-1, n))
 
         # states
         self.time = data[:, 0]
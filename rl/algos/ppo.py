@@ -7,6 +7,9 @@ from torch.utils.data.sampler import BatchSampler, SubsetRandomSampler
 from torch.distributions import kl_divergence
 
 from torch.nn.utils.rnn import pad_sequence
+from torch.nn.utils import parameters_to_vector, vector_to_parameters
+
+from scipy.signal import lfilter
 
 import time
 
@@ -15,87 +18,260 @@ import os, sys
 
 import ray
 
-from rl.envs import WrapEnv
-
 from rl.policies.actor import Gaussian_FF_Actor, Gaussian_LSTM_Actor
 from rl.policies.critic import FF_V, LSTM_V
 from rl.envs.normalize import get_normalization_params, PreNormalizer
+from cassie.step_timer import merge_perf_stats, per_step_us
 
 import pickle
 
 class PPOBuffer:
     """
-    A buffer for storing trajectory data and calculating returns for the policy
-    and critic updates.
-    This container is intentionally not optimized w.r.t. to memory allocation
-    speed because such allocation is almost never a bottleneck for policy 
-    gradient. 
-    
-    On the other hand, experience buffers are a frequent source of
-    off-by-one errors and other bugs in policy gradient implementations, so
-    this code is optimized for clarity and readability, at the expense of being
-    (very) marginally slower than some other implementations. 
-    (Premature optimization is the root of all evil).
+    A buffer for storing trajectory data and calculating returns and
+    advantages for the policy and critic updates.
+
+    Storage is preallocated float32 arrays, one row per timestep, sized for
+    the most a sampler can collect (min_steps plus one trajectory), so storing
+    a step is a row write and get() returns contiguous views that can be handed
+    to torch without copying. Returns and advantages are computed per
+    trajectory in finish_path with a reverse discounted scan. With use_gae the
+    advantages are GAE(lambda) and the returns the matching lambda-returns
+    (advantages + values), otherwise the returns are the discounted rewards to
+    go and the advantages returns - values.
+
+    The log-probability of each action under the policy that sampled it is
+    stored as well, for the ratio when the batch is optimized against a
+    policy that has moved on since (pipelined training).
     """
-    def __init__(self, gamma=0.99, lam=0.95, use_gae=False):
-        self.states  = []
-        self.actions = []
-        self.rewards = []
-        self.values  = []
-        self.returns = []
+    fields = ["states", "actions", "rewards", "values", "returns", "advantages", "log_probs"]
+
+    def __init__(self, obs_dim, act_dim, size, gamma=0.99, lam=0.95, use_gae=False):
+        self.states     = np.zeros((size, obs_dim), dtype=np.float32)
+        self.actions    = np.zeros((size, act_dim), dtype=np.float32)
+        self.rewards    = np.zeros(size, dtype=np.float32)
+        self.values     = np.zeros(size, dtype=np.float32)
+        self.returns    = np.zeros(size, dtype=np.float32)
+        self.advantages = np.zeros(size, dtype=np.float32)
+        self.log_probs  = np.zeros(size, dtype=np.float32)
 
         self.ep_returns = [] # for logging
         self.ep_lens    = []
+        self.perf_stats = {} # env step section timings, if the env records them
 
-        self.gamma, self.lam = gamma, lam
+        self.gamma, self.lam, self.use_gae = gamma, lam, use_gae
 
         self.ptr = 0
         self.traj_idx = [0]
-    
+
     def __len__(self):
-        return len(self.states)
+        return self.ptr
 
     def storage_size(self):
         return len(self.states)
 
-    def store(self, state, action, reward, value):
+    # Only the filled rows are pickled, e.g. when a buffer is sent back from a
+    # ray worker
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in self.fields:
+            state[name] = state[name][:self.ptr]
+        return state
+
+    def _grow(self):
+        for name in self.fields:
+            arr = getattr(self, name)
+            grown = np.zeros((max(2 * len(arr), 1),) + arr.shape[1:], dtype=arr.dtype)
+            grown[:len(arr)] = arr
+            setattr(self, name, grown)
+
+    def store(self, state, action, reward, value, log_prob=None):
         """
-        Append one timestep of agent-environment interaction to the buffer.
+        Write one timestep of agent-environment interaction to the buffer.
         """
-        # TODO: make sure these dimensions really make sense
-        self.states  += [state.squeeze(0)]
-        self.actions += [action.squeeze(0)]
-        self.rewards += [reward.squeeze(0)]
-        self.values  += [value.squeeze(0)]
+        if self.ptr == len(self.states):
+            self._grow()
+        self.states[self.ptr]  = state.squeeze(0)
+        self.actions[self.ptr] = action.squeeze(0)
+        self.rewards[self.ptr] = reward.squeeze()
+        self.values[self.ptr]  = value.squeeze()
+        if log_prob is not None:
+            self.log_probs[self.ptr] = log_prob.squeeze()
 
         self.ptr += 1
-    
+
     def finish_path(self, last_val=None):
+        start, end = self.traj_idx[-1], self.ptr
         self.traj_idx += [self.ptr]
-        rewards = self.rewards[self.traj_idx[-2]:self.traj_idx[-1]]
 
-        returns = []
+        last_val = float(np.asarray(last_val).reshape(-1)[0]) if last_val is not None else 0.0
+        rewards = self.rewards[start:end]
+        values = self.values[start:end]
 
-        R = last_val.squeeze(0).copy() # Avoid copy?
-        for reward in reversed(rewards):
-            R = self.gamma * R + reward
-            returns.insert(0, R) # TODO: self.returns.insert(self.path_idx, R) ? 
-                                 # also technically O(k^2), may be worth just reversing list
-                                 # BUG? This is adding copies of R by reference (?)
-
-        self.returns += returns
+        self.returns[start:end] = discount(np.append(rewards, last_val), self.gamma)[:-1]
+        if self.use_gae:
+            deltas = rewards + self.gamma * np.append(values[1:], last_val) - values
+            self.advantages[start:end] = discount(deltas, self.gamma * self.lam)
+            self.returns[start:end] = self.advantages[start:end] + values
+        else:
+            self.advantages[start:end] = self.returns[start:end] - values
 
         self.ep_returns += [np.sum(rewards)]
-        self.ep_lens    += [len(rewards)]
+        self.ep_lens    += [end - start]
 
     def get(self):
         return(
-            self.states,
-            self.actions,
-            self.returns,
-            self.values
+            self.states[:self.ptr],
+            self.actions[:self.ptr],
+            self.returns[:self.ptr, None],
+            self.values[:self.ptr, None],
+            self.advantages[:self.ptr, None],
+            self.log_probs[:self.ptr, None]
         )
 
+# x[t] + gamma * x[t+1] + gamma^2 * x[t+2] + ... for every t, as a reverse
+# first order filter
+def discount(x, gamma):
+    return lfilter([1], [1, -gamma], x[::-1])[::-1]
+
+# Samples trajectories with its own envs and copies of the policy and critic,
+# which are kept between calls so that the envs are only built once. Each call
+# loads the current weights (the flat vector from flat_weights) and then runs
+# whole trajectories, so no episode spans two policies.
+#
+# With num_envs > 1 the envs are stepped in lockstep and the policy and critic
+# are run once per step on the batch of all envs still sampling. Each env
+# keeps its trajectories in its own buffer, and the buffers are merged when
+# the call returns. A trajectory is only started while the steps taken plus
+# the most the running trajectories can still take fall short of min_steps,
+# so a call overshoots min_steps by less than max_traj_len whatever the
+# number of envs. Envs therefore only all run together while the remaining
+# budget covers a trajectory for each (min_steps >= num_envs * max_traj_len
+# at the start). Recurrent policies keep one hidden state, so they are only
+# sampled with num_envs = 1.
+class PPOSampler:
+    def __init__(self, env_fn, policy, critic, gamma, lam, use_gae, num_envs=1):
+        torch.set_num_threads(1) # By default, PyTorch will use multiple cores to speed up operations.
+                                 # This can cause issues when Ray also uses multiple cores, especially on machines
+                                 # with a lot of CPUs. I observed a significant speedup when limiting PyTorch 
+                                 # to a single core - I think it basically stopped ray workers from stepping on each
+                                 # other's toes.
+
+        self.envs = [env_fn() for _ in range(num_envs)]
+        self.policy = deepcopy(policy)
+        self.critic = deepcopy(critic)
+        self.gamma, self.lam, self.use_gae = gamma, lam, use_gae
+
+    @torch.no_grad()
+    def sample(self, weights, min_steps, max_traj_len, deterministic=False, anneal=1.0):
+        """
+        Sample at least min_steps number of total timesteps, truncating 
+        trajectories only if they exceed max_traj_len number of timesteps
+        """
+        # copied, the array from the object store is read-only and shared
+        vector_to_parameters(torch.tensor(weights), list(self.policy.parameters()) + list(self.critic.parameters()))
+        envs, policy, critic = self.envs, self.policy, self.critic
+        # at most min_steps plus the rest of the last trajectories
+        obs_dim, act_dim = envs[0].observation_space.shape[0], envs[0].action_space.shape[0]
+        buffers = [PPOBuffer(obs_dim, act_dim, min_steps // len(envs) + max_traj_len, self.gamma, self.lam, use_gae=self.use_gae) for _ in envs]
+
+        for env in envs:
+            if hasattr(env, 'reset_perf_stats'):
+                env.reset_perf_stats()
+
+        def start_trajectory(i):
+            if hasattr(policy, 'init_hidden_state'):
+                policy.init_hidden_state()
+
+            if hasattr(critic, 'init_hidden_state'):
+                critic.init_hidden_state()
+
+            states[i] = envs[i].reset()
+            traj_lens[i] = 0
+
+        states = np.zeros((len(envs), obs_dim), dtype=np.float32)
+        traj_lens = np.zeros(len(envs), dtype=int)
+        sampling = np.zeros(len(envs), dtype=bool)
+
+        num_steps = 0
+        while True:
+            # start trajectories on idle envs while the step budget isn't
+            # covered by the ones already running
+            for i in np.flatnonzero(~sampling):
+                in_flight = np.sum(max_traj_len - traj_lens[sampling])
+                if num_steps + in_flight >= min_steps:
+                    break
+                start_trajectory(i)
+                sampling[i] = True
+            if not sampling.any():
+                break
+
+            idx = np.flatnonzero(sampling)
+            state = torch.from_numpy(states[idx])
+            # same as policy(state, deterministic=False, anneal=anneal), keeping
+            # the distribution for the behaviour log-probs
+            pdf = policy.distribution(state)
+            if anneal != 1.0:
+                pdf = torch.distributions.Normal(pdf.loc, pdf.scale * anneal)
+            actions = pdf.sample()
+            log_probs = pdf.log_prob(actions).sum(-1, keepdim=True).numpy()
+            actions = actions.numpy()
+            values = critic(state).numpy()
+
+            for j, i in enumerate(idx):
+                next_state, reward, done, _ = envs[i].step(actions[j])
+
+                buffers[i].store(states[i:i+1], actions[j:j+1], np.array([reward]), values[j:j+1], log_probs[j:j+1])
+
+                traj_lens[i] += 1
+                num_steps += 1
+
+                if done or traj_lens[i] >= max_traj_len:
+                    last_val = 0 if done else critic(torch.Tensor(next_state).unsqueeze(0)).numpy()
+                    buffers[i].finish_path(last_val=last_val)
+                    sampling[i] = False
+                else:
+                    states[i] = next_state
+
+        memory = merge_buffers(buffers)
+        memory.perf_stats = merge_perf_stats([env.perf_stats() for env in envs if hasattr(env, 'perf_stats')])
+
+        return memory
+
+# Concatenation of several buffers, with one copy of each into the merged arrays
+def merge_buffers(buffers):
+    obs_dim, act_dim = buffers[0].states.shape[1], buffers[0].actions.shape[1]
+    merged = PPOBuffer(obs_dim, act_dim, sum(len(buf) for buf in buffers), buffers[0].gamma, buffers[0].lam, use_gae=buffers[0].use_gae)
+    for buf in buffers:
+        offset, n = merged.ptr, len(buf)
+        for name in PPOBuffer.fields:
+            getattr(merged, name)[offset:offset + n] = getattr(buf, name)[:n]
+
+        merged.ep_returns += buf.ep_returns
+        merged.ep_lens    += buf.ep_lens
+
+        merged.traj_idx += [offset + i for i in buf.traj_idx[1:]]
+        merged.ptr += n
+
+    merged.perf_stats = merge_perf_stats([buf.perf_stats for buf in buffers])
+    return merged
+
+# Policy and critic parameters as one flat float32 array, in the order
+# PPOSampler.sample loads them
+def flat_weights(policy, critic):
+    return parameters_to_vector(list(policy.parameters()) + list(critic.parameters())).detach().cpu().numpy().astype(np.float32)
+
+# Copies of the parameters of a module, without the rest of its state
+def snapshot_state(module):
+    return {k: v.detach().clone() for k, v in module.state_dict().items()}
+
+# A copy of module with the parameters of a snapshot. After an update the
+# hidden state of a recurrent module is still attached to the graph, which
+# deepcopy refuses, so the copy is made by pickling.
+def module_from_state(module, state):
+    copy = pickle.loads(pickle.dumps(module))
+    copy.load_state_dict(state)
+    return copy
+
 class PPO:
     def __init__(self, args, save_path):
         self.env_name       = args['env_name']
@@ -113,10 +289,18 @@ class PPO:
         self.n_proc         = args['num_procs']
         self.grad_clip      = args['max_grad_norm']
         self.recurrent      = args['recurrent']
+        self.envs_per_worker = args.get('envs_per_worker', 1)
+        self.pipelined      = args.get('pipelined', False)
+        self.eval_procs     = args.get('eval_procs', 4)
 
         self.total_steps = 0
         self.highest_reward = -1
         self.limit_cores = 0
+        self.samplers = None
+        self.eval_samplers = None
+        self.pending_eval = None
+        self.next_eval = None
+        self.last_eval_reward = None
 
         self.save_path = save_path
 
@@ -136,98 +320,104 @@ class PPO:
         torch.save(policy, os.path.join(self.save_path, "actor" + filetype))
         torch.save(critic, os.path.join(self.save_path, "critic" + filetype))
 
-    @ray.remote
-    @torch.no_grad()
-    def sample(self, env_fn, policy, critic, min_steps, max_traj_len, deterministic=False, anneal=1.0):
-        """
-        Sample at least min_steps number of total timesteps, truncating 
-        trajectories only if they exceed max_traj_len number of timesteps
-        """
-        torch.set_num_threads(1) # By default, PyTorch will use multiple cores to speed up operations.
-                                 # This can cause issues when Ray also uses multiple cores, especially on machines
-                                 # with a lot of CPUs. I observed a significant speedup when limiting PyTorch 
-                                 # to a single core - I think it basically stopped ray workers from stepping on each
-                                 # other's toes.
-
-        env = WrapEnv(env_fn) # TODO
-
-        memory = PPOBuffer(self.gamma, self.lam)
-
-        num_steps = 0
-        while num_steps < min_steps:
-            state = torch.Tensor(env.reset())
-
-            done = False
-            value = 0
-            traj_len = 0
-
-            if hasattr(policy, 'init_hidden_state'):
-                policy.init_hidden_state()
-
-            if hasattr(critic, 'init_hidden_state'):
-                critic.init_hidden_state()
-
-            while not done and traj_len < max_traj_len:
-                action = policy(state, deterministic=False, anneal=anneal)
-                value = critic(state)
-
-                next_state, reward, done, _ = env.step(action.numpy())
-
-                memory.store(state.numpy(), action.numpy(), reward, value.numpy())
-
-                state = torch.Tensor(next_state)
-
-                traj_len += 1
-                num_steps += 1
-
-            value = critic(state)
-            memory.finish_path(last_val=(not done) * value.numpy())
-
-        return memory
-
-    def sample_parallel(self, env_fn, policy, critic, min_steps, max_traj_len, deterministic=False, anneal=1.0):
-        worker = self.sample
-        args = (self, env_fn, policy, critic, min_steps, max_traj_len, deterministic, anneal)
+    # Long lived samplers, each building its envs once. Remote ray actors, or a
+    # single local one when running on one process.
+    def make_samplers(self, env_fn, policy, critic, count=None):
+        num_envs = 1 if self.recurrent else self.envs_per_worker
+        if self.n_proc > 1:
+            remote_sampler = ray.remote(PPOSampler)
+            return [remote_sampler.remote(env_fn, policy, critic, self.gamma, self.lam, self.use_gae, num_envs) for _ in range(count or self.n_proc)]
+        return [PPOSampler(env_fn, policy, critic, self.gamma, self.lam, self.use_gae, num_envs)]
+
+    # Current weights for the samplers, put in the ray object store once so
+    # that every sampler reads the same copy
+    def put_weights(self, policy, critic):
+        weights = flat_weights(policy, critic)
+        return ray.put(weights) if self.n_proc > 1 else weights
+
+    # Start sampling a batch. With ray the samplers run in the background and
+    # this returns right away, collect_samples waits for the batch.
+    def sample_async(self, env_fn, policy, critic, min_steps, max_traj_len, deterministic=False, anneal=1.0, weights=None):
+        if self.samplers is None:
+            self.samplers = self.make_samplers(env_fn, policy, critic)
+        if weights is None:
+            weights = self.put_weights(policy, critic)
+        args = (weights, min_steps, max_traj_len, deterministic, anneal)
 
         # Don't don't bother launching another process for single thread
         if self.n_proc > 1:
             real_proc = self.n_proc
             if self.limit_cores:
-                real_proc = 48 - 16*int(np.log2(60 / env_fn().simrate))
+                real_proc = 48 - 16*int(np.log2(60 / self.simrate))
                 print("limit cores active, using {} cores".format(real_proc))
-                args = (self, env_fn, policy, critic, min_steps*self.n_proc // real_proc, max_traj_len, deterministic, anneal)
-            result_ids = [worker.remote(*args) for _ in range(real_proc)]
-            result = ray.get(result_ids)
+                args = (weights, min_steps*self.n_proc // real_proc, max_traj_len, deterministic, anneal)
+            # calls beyond the number of samplers queue up on them in turn
+            result = [self.samplers[i % self.n_proc].sample.remote(*args) for i in range(real_proc)]
         else:
-            result = [worker._function(*args)]
-        
-        # O(n)
-        def merge(buffers):
-            merged = PPOBuffer(self.gamma, self.lam)
-            for buf in buffers:
-                offset = len(merged)
+            result = [self.samplers[0].sample(*args)]
+        return result, min_steps
 
-                merged.states  += buf.states
-                merged.actions += buf.actions
-                merged.rewards += buf.rewards
-                merged.values  += buf.values
-                merged.returns += buf.returns
-
-                merged.ep_returns += buf.ep_returns
-                merged.ep_lens    += buf.ep_lens
-
-                merged.traj_idx += [offset + i for i in buf.traj_idx[1:]]
-                merged.ptr += buf.ptr
-
-            return merged
+    def collect_samples(self, pending):
+        result, min_steps = pending
+        if self.n_proc > 1:
+            result = ray.get(result)
 
-        total_buf = merge(result)
+        total_buf = merge_buffers(result)
         if len(total_buf) > min_steps*self.n_proc * 1.5:
             self.limit_cores = 1
         return total_buf
 
+    def sample_parallel(self, env_fn, policy, critic, min_steps, max_traj_len, deterministic=False, anneal=1.0, weights=None):
+        return self.collect_samples(self.sample_async(env_fn, policy, critic, min_steps, max_traj_len, deterministic, anneal, weights))
+
+    # Evaluation for pipelined training, run in the background on samplers of
+    # its own. One evaluation is in flight at a time. An iteration that
+    # finishes while one is running replaces any earlier waiting request and
+    # is evaluated as soon as the running one is done, so the newest policy is
+    # always the next evaluated. The parameters each request was made with are
+    # kept, so they can be saved if it turns out to be the best so far.
+    def launch_evaluation(self, env_fn, policy, critic, weights, itr):
+        if self.eval_samplers is None:
+            self.eval_samplers = self.make_samplers(env_fn, policy, critic, count=self.eval_procs)
+        request = (itr, weights, snapshot_state(policy), snapshot_state(critic))
+        if self.pending_eval is not None:
+            if self.next_eval is not None:
+                print("evaluation of iteration {} skipped for iteration {}".format(self.next_eval[0], itr))
+            self.next_eval = request
+            return
+        self.start_evaluation(request)
+
+    def start_evaluation(self, request):
+        itr, weights, policy_state, critic_state = request
+        result_ids = [sampler.sample.remote(weights, 800 // self.eval_procs, self.max_traj_len, True) for sampler in self.eval_samplers]
+        self.pending_eval = (itr, result_ids, policy_state, critic_state)
+
+    # Report the pending evaluation if it has finished (or once it does, with
+    # block) and start the waiting one. With block every request is waited for.
+    def poll_evaluation(self, logger, block=False):
+        while self.pending_eval is not None:
+            itr, result_ids, policy_state, critic_state = self.pending_eval
+            ready, _ = ray.wait(result_ids, num_returns=len(result_ids), timeout=None if block else 0)
+            if len(ready) < len(result_ids):
+                return
+            self.pending_eval = None
+
+            avg_eval_reward = np.mean([r for buf in ray.get(result_ids) for r in buf.ep_returns])
+            print("evaluation of iteration {}: return {:.2f}".format(itr, avg_eval_reward))
+            logger.add_scalar("Test/Return", avg_eval_reward, itr)
+            self.last_eval_reward = avg_eval_reward
 
-    def update_policy(self, obs_batch, action_batch, return_batch, advantage_batch, mask, env_fn, mirror_observation=None, mirror_action=None):
+            if self.highest_reward < avg_eval_reward:
+                self.highest_reward = avg_eval_reward
+                self.save(module_from_state(self.policy, policy_state), module_from_state(self.critic, critic_state))
+
+            if self.next_eval is not None:
+                self.start_evaluation(self.next_eval)
+                self.next_eval = None
+                if not block:
+                    return
+
+    def update_policy(self, obs_batch, action_batch, return_batch, advantage_batch, mask, env_fn, mirror_observation=None, mirror_action=None, behaviour_log_probs=None):
         policy = self.policy
         critic = self.critic
         old_policy = self.old_policy
@@ -239,6 +429,11 @@ class PPO:
         with torch.no_grad():
             old_pdf = old_policy.distribution(obs_batch)
             old_log_probs = old_pdf.log_prob(action_batch).sum(-1, keepdim=True)
+
+        # in pipelined training the batch was sampled by an older policy, so
+        # the ratio is taken against the log-probs it sampled with
+        if behaviour_log_probs is not None:
+            old_log_probs = behaviour_log_probs
         
         log_probs = pdf.log_prob(action_batch).sum(-1, keepdim=True)
         
@@ -315,6 +510,7 @@ class PPO:
         start_time = time.time()
 
         env = env_fn()
+        self.simrate = getattr(env, 'simrate', None)
         obs_mirr, act_mirr = None, None
         if hasattr(env, 'mirror_observation'):
             if env.clock_based:
@@ -325,6 +521,16 @@ class PPO:
         if hasattr(env, 'mirror_action'):
             act_mirr = env.mirror_action
 
+        # weights for the samplers, updated after every optimization
+        weights = self.put_weights(policy, critic)
+
+        # Pipelined: the samplers collect the next batch with the current
+        # weights while this one is optimized
+        pipelined = self.pipelined and self.n_proc > 1
+        if self.pipelined and not pipelined:
+            print("pipelined training needs num_procs > 1, sampling serially")
+        pending = None
+
         curr_anneal = 1.0
         for itr in range(n_itr):
             print("********** Iteration {} ************".format(itr))
@@ -332,15 +538,22 @@ class PPO:
             sample_start = time.time()
             if self.highest_reward > self.max_traj_len and curr_anneal > 0.5:
                 curr_anneal *= anneal_rate
-            batch = self.sample_parallel(env_fn, self.policy, self.critic, self.num_steps, self.max_traj_len, anneal=curr_anneal)
+            if pending is None:
+                pending = self.sample_async(env_fn, self.policy, self.critic, self.num_steps, self.max_traj_len, anneal=curr_anneal, weights=weights)
+            batch = self.collect_samples(pending)
+            pending = None
+            if pipelined:
+                pending = self.sample_async(env_fn, self.policy, self.critic, self.num_steps, self.max_traj_len, anneal=curr_anneal, weights=weights)
 
             print("time elapsed: {:.2f} s".format(time.time() - start_time))
             samp_time = time.time() - sample_start
             print("sample time elapsed: {:.2f} s".format(samp_time))
+            step_times = per_step_us(batch.perf_stats)
+            if step_times:
+                print("env step time (us/step): " + ", ".join("{} {:.1f}".format(name, t) for name, t in step_times.items()))
 
-            observations, actions, returns, values = map(torch.Tensor, batch.get())
+            observations, actions, returns, values, advantages, log_probs = map(torch.from_numpy, batch.get())
 
-            advantages = returns - values
             advantages = (advantages - advantages.mean()) / (advantages.std() + self.eps)
 
             minibatch_size = self.minibatch_size or advantages.numel()
@@ -369,21 +582,25 @@ class PPO:
                         action_batch    = [actions[batch.traj_idx[i]:batch.traj_idx[i+1]] for i in indices]
                         return_batch    = [returns[batch.traj_idx[i]:batch.traj_idx[i+1]] for i in indices]
                         advantage_batch = [advantages[batch.traj_idx[i]:batch.traj_idx[i+1]] for i in indices]
+                        log_prob_batch  = [log_probs[batch.traj_idx[i]:batch.traj_idx[i+1]] for i in indices]
                         mask            = [torch.ones_like(r) for r in return_batch]
 
                         obs_batch       = pad_sequence(obs_batch, batch_first=False)
                         action_batch    = pad_sequence(action_batch, batch_first=False)
                         return_batch    = pad_sequence(return_batch, batch_first=False)
                         advantage_batch = pad_sequence(advantage_batch, batch_first=False)
+                        log_prob_batch  = pad_sequence(log_prob_batch, batch_first=False)
                         mask            = pad_sequence(mask, batch_first=False)
                     else:
                         obs_batch       = observations[indices]
                         action_batch    = actions[indices]
                         return_batch    = returns[indices]
                         advantage_batch = advantages[indices]
+                        log_prob_batch  = log_probs[indices]
                         mask            = 1
 
-                    scalars = self.update_policy(obs_batch, action_batch, return_batch, advantage_batch, mask, env_fn, mirror_observation=obs_mirr, mirror_action=act_mirr)
+                    scalars = self.update_policy(obs_batch, action_batch, return_batch, advantage_batch, mask, env_fn, mirror_observation=obs_mirr, mirror_action=act_mirr,
+                                                 behaviour_log_probs=log_prob_batch if pipelined else None)
                     actor_loss, entropy, critic_loss, ratio, kl, mirror_loss = scalars
 
                     entropies.append(entropy)
@@ -401,13 +618,22 @@ class PPO:
             opt_time = time.time() - optimizer_start
             print("optimizer time elapsed: {:.2f} s".format(opt_time))
 
+            weights = self.put_weights(policy, critic)
+
             if logger is not None:
                 evaluate_start = time.time()
-                test = self.sample_parallel(env_fn, self.policy, self.critic, 800 // self.n_proc, self.max_traj_len, deterministic=True)
+                if pipelined:
+                    # reported (and saved if best) when it finishes, the table
+                    # below shows the latest finished evaluation
+                    self.poll_evaluation(logger)
+                    self.launch_evaluation(env_fn, policy, critic, weights, itr)
+                    avg_eval_reward = self.last_eval_reward
+                else:
+                    test = self.sample_parallel(env_fn, self.policy, self.critic, 800 // self.n_proc, self.max_traj_len, deterministic=True, weights=weights)
+                    avg_eval_reward = np.mean(test.ep_returns)
                 eval_time = time.time() - evaluate_start
                 print("evaluate time elapsed: {:.2f} s".format(eval_time))
 
-                avg_eval_reward = np.mean(test.ep_returns)
                 avg_batch_reward = np.mean(batch.ep_returns)
                 avg_ep_len = np.mean(batch.ep_lens)
                 mean_losses = np.mean(losses, axis=0)
@@ -425,7 +651,8 @@ class PPO:
                 entropy = np.mean(entropies)
                 kl = np.mean(kls)
 
-                logger.add_scalar("Test/Return", avg_eval_reward, itr)
+                if not pipelined:
+                    logger.add_scalar("Test/Return", avg_eval_reward, itr)
                 logger.add_scalar("Train/Return", avg_batch_reward, itr)
                 logger.add_scalar("Train/Mean Eplen", avg_ep_len, itr)
                 logger.add_scalar("Train/Mean KL Div", kl, itr)
@@ -437,14 +664,19 @@ class PPO:
                 logger.add_scalar("Misc/Timesteps", self.total_steps, itr)
 
                 logger.add_scalar("Misc/Sample Times", samp_time, itr)
+                for name, t in step_times.items():
+                    logger.add_scalar("Misc/Step Times/" + name, t, itr)
                 logger.add_scalar("Misc/Optimize Times", opt_time, itr)
                 logger.add_scalar("Misc/Evaluation Times", eval_time, itr)
 
             # TODO: add option for how often to save model
-            if self.highest_reward < avg_eval_reward:
+            if not pipelined and self.highest_reward < avg_eval_reward:
                 self.highest_reward = avg_eval_reward
                 self.save(policy, critic)
 
+        if pipelined and logger is not None:
+            self.poll_evaluation(logger, block=True)
+
 def run_experiment(args):
     from util import env_factory, create_logger
 
@@ -512,6 +744,8 @@ def run_experiment(args):
     print(" ├ max traj len:   {}".format(args.max_traj_len))
     print(" ├ seed:           {}".format(args.seed))
     print(" ├ num procs:      {}".format(args.num_procs))
+    print(" ├ envs per proc:  {}".format(args.envs_per_worker))
+    print(" ├ pipelined:      {}".format(args.pipelined))
     print(" ├ lr:             {}".format(args.lr))
     print(" ├ eps:            {}".format(args.eps))
     print(" ├ lam:            {}".format(args.lam))
@@ -1,6 +1,9 @@
 # Modified from https://github.com/openai/baselines/blob/master/baselines/common/vec_env/dummy_vec_env.py
 # Thanks to the authors + OpenAI for the code
 
+import ctypes
+import multiprocessing as mp
+
 import numpy as np
 
 class Vectorize:
@@ -45,4 +48,148 @@ class Vectorize:
     def observation_space(self):
         return self._observation_space
 
-    
\ No newline at end of file
+    # Subprocess version of Vectorize, after baselines' ShmemVecEnv. Each worker
+# process owns envs_per_worker of the envs. Actions, observations, rewards and
+# dones go through shared memory buffers with one row per env, so the pipes only
+# carry the command and, on steps where an env returns one, its info dict.
+# Envs that are done are reset inside their worker: the observation returned
+# for them is the first one of the new episode, and the last one of the
+# finished episode is in info["terminal_observation"].
+class SubprocVectorize:
+    def __init__(self, env_fns, envs_per_worker=1, context=None):
+        # spaces are read off a throwaway env in this process
+        dummy = env_fns[0]()
+        self._observation_space = dummy.observation_space
+        self._action_space = dummy.action_space
+        del dummy
+
+        n = len(env_fns)
+        obs_dim = int(np.prod(self._observation_space.shape))
+        act_dim = int(np.prod(self._action_space.shape))
+
+        ctx = mp.get_context(context)
+        buffers = (ctx.RawArray(ctypes.c_double, n * obs_dim), ctx.RawArray(ctypes.c_double, n * act_dim),
+                   ctx.RawArray(ctypes.c_double, n), ctx.RawArray(ctypes.c_bool, n))
+        self.obs, self.actions, self.rews, self.dones = _buffer_views(buffers, 0, n, obs_dim, act_dim)
+
+        self.conns = []
+        self.procs = []
+        self.slices = []
+        for lo in range(0, n, envs_per_worker):
+            hi = min(lo + envs_per_worker, n)
+            parent_conn, child_conn = ctx.Pipe()
+            proc = ctx.Process(target=_subproc_worker, args=(child_conn, env_fns[lo:hi], buffers, lo, hi, obs_dim, act_dim), daemon=True)
+            proc.start()
+            child_conn.close()
+            self.conns.append(parent_conn)
+            self.procs.append(proc)
+            self.slices.append((lo, hi))
+
+        self.ts = np.zeros(n, dtype='int')
+        self.waiting = False
+        self.closed = False
+
+    def step_async(self, action_n):
+        self.actions[:] = np.asarray(action_n).reshape(self.actions.shape)
+        for conn in self.conns:
+            conn.send(("step", None))
+        self.waiting = True
+
+    def step_wait(self):
+        infos = [{} for _ in range(self.num_envs)]
+        for conn, (lo, hi) in zip(self.conns, self.slices):
+            worker_infos = conn.recv()
+            if worker_infos is not None:
+                infos[lo:hi] = worker_infos
+        self.waiting = False
+
+        dones = self.dones.copy()
+        self.ts += 1
+        self.ts[dones] = 0
+        return self.obs.copy(), self.rews.copy(), dones, infos
+
+    def step(self, action_n):
+        self.step_async(action_n)
+        return self.step_wait()
+
+    def reset(self):
+        for conn in self.conns:
+            conn.send(("reset", None))
+        for conn in self.conns:
+            conn.recv()
+        self.ts[:] = 0
+        return self.obs.copy()
+
+    # Call a method on every env, returns the results in env order
+    def env_method(self, name, *args, **kwargs):
+        for conn in self.conns:
+            conn.send(("call", (name, args, kwargs)))
+        return [result for conn in self.conns for result in conn.recv()]
+
+    def close(self):
+        if self.closed:
+            return
+        if self.waiting:
+            for conn in self.conns:
+                conn.recv()
+        for conn in self.conns:
+            conn.send(("close", None))
+        for proc in self.procs:
+            proc.join()
+        self.closed = True
+
+    @property
+    def num_envs(self):
+        return len(self.ts)
+
+    @property
+    def action_space(self):
+        return self._action_space
+
+    @property
+    def observation_space(self):
+        return self._observation_space
+
+# numpy views of rows lo:hi of the shared obs, action, reward and done buffers
+def _buffer_views(buffers, lo, hi, obs_dim, act_dim):
+    obs_buf, act_buf, rew_buf, done_buf = buffers
+    obs = np.frombuffer(obs_buf, dtype=np.float64).reshape(-1, obs_dim)[lo:hi]
+    actions = np.frombuffer(act_buf, dtype=np.float64).reshape(-1, act_dim)[lo:hi]
+    rews = np.frombuffer(rew_buf, dtype=np.float64)[lo:hi]
+    dones = np.frombuffer(done_buf, dtype=np.bool_)[lo:hi]
+    return obs, actions, rews, dones
+
+def _subproc_worker(conn, env_fns, buffers, lo, hi, obs_dim, act_dim):
+    envs = [fn() for fn in env_fns]
+    obs, actions, rews, dones = _buffer_views(buffers, lo, hi, obs_dim, act_dim)
+    try:
+        while True:
+            cmd, data = conn.recv()
+            if cmd == "step":
+                infos = None
+                for i, env in enumerate(envs):
+                    state, reward, done, info = env.step(actions[i])
+                    if done:
+                        info = dict(info, terminal_observation=np.array(state))
+                        state = env.reset()
+                    obs[i] = state
+                    rews[i] = reward
+                    dones[i] = done
+                    if info:
+                        if infos is None:
+                            infos = [{} for _ in envs]
+                        infos[i] = info
+                conn.send(infos)
+            elif cmd == "reset":
+                for i, env in enumerate(envs):
+                    obs[i] = env.reset()
+                conn.send(None)
+            elif cmd == "call":
+                name, args, kwargs = data
+                conn.send([getattr(env, name)(*args, **kwargs) for env in envs])
+            elif cmd == "close":
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        conn.close()
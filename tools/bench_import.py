@@ -0,0 +1,51 @@
+# Measures the time to import the main entry points, each in a fresh interpreter.
+# Run from the repo root:
+#   python tools/bench_import.py [--n 5] [--modules util cassie ...] [--detail]
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+default_modules = ["cassie", "cassie.cassiemujoco", "util", "cassie.cassie", "rl.algos.ppo", "tools.eval_perturb"]
+
+def time_import(module, root):
+    start = time.time()
+    subprocess.run([sys.executable, "-c", "import " + module], cwd=root, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.time() - start
+
+# Slowest imports (cumulative us) from python -X importtime
+def import_profile(module, root, top=10):
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import " + module], cwd=root,
+                         stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True).stderr
+    rows = []
+    for line in out.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cum_us, name = line.split("|")
+        rows.append((int(cum_us), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=5, help="number of runs per module")
+    parser.add_argument("--modules", nargs="+", default=default_modules)
+    parser.add_argument("--detail", default=False, action="store_true", help="print slowest imports of each module")
+    args = parser.parse_args()
+
+    root = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+    baseline = np.median([time_import("sys", root) for _ in range(args.n)])
+    print("interpreter start: {:.3f}s".format(baseline))
+    for module in args.modules:
+        try:
+            times = [time_import(module, root) for _ in range(args.n)]
+        except subprocess.CalledProcessError:
+            print("{:<24} failed to import".format(module))
+            continue
+        print("{:<24} {:.3f}s (min {:.3f}s)".format(module, np.median(times) - baseline, np.min(times) - baseline))
+        if args.detail:
+            for cum_us, name in import_profile(module, root):
+                print("    {:>10.1f} ms  {}".format(cum_us / 1000, name))
@@ -0,0 +1,63 @@
+# Times each registered reward kernel against the plain reward function it
+# replaces, on states visited by a random policy, and checks that they agree.
+# Run from the repo root:
+#   python tools/bench_rewards.py [--n 2000] [--steps 50] [--rewards iros_paper clock_smooth ...]
+import argparse
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(".")
+
+from cassie import CassieEnv_v2
+
+# reward argument -> trajectory the env needs for it
+default_rewards = {
+    "iros_paper":         "walking",
+    "5k_speed_reward":    "walking",
+    "clock_smooth":       "walking",
+    "max_vel_clock_smooth": "walking",
+    "aslip_clock_smooth": "aslip",
+    "aslip_old":          "aslip",
+}
+
+def time_call(fn, n):
+    start = time.time()
+    for _ in range(n):
+        fn()
+    return (time.time() - start) / n
+
+def bench_reward(reward, traj, n, steps):
+    env = CassieEnv_v2(traj=traj, clock_based=traj != "aslip", reward=reward)
+    env.reset()
+    kernel_times, ref_times, max_err = [], [], 0
+    for _ in range(steps):
+        action = np.random.uniform(-0.2, 0.2, env.action_space.shape[0])
+        env.step(action)
+        snap = env.reward_snapshot
+
+        def run_kernel():
+            snap.update(env)
+            return env._reward_kernel(env, snap, action)
+
+        def run_ref():
+            return env._reward_ref(env, action)
+
+        max_err = max(max_err, abs(run_kernel() - run_ref()))
+        kernel_times.append(time_call(run_kernel, n // steps))
+        ref_times.append(time_call(run_ref, n // steps))
+    return np.median(kernel_times), np.median(ref_times), max_err
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=2000, help="calls per reward")
+    parser.add_argument("--steps", type=int, default=50, help="env states to time the calls on")
+    parser.add_argument("--rewards", nargs="+", default=list(default_rewards))
+    args = parser.parse_args()
+
+    print("{:<24} {:>10} {:>10} {:>8} {:>10}".format("reward", "kernel", "function", "speedup", "max err"))
+    for reward in args.rewards:
+        traj = default_rewards.get(reward, "aslip" if reward.startswith("aslip") else "walking")
+        kernel_t, ref_t, err = bench_reward(reward, traj, args.n, args.steps)
+        print("{:<24} {:>8.1f}us {:>8.1f}us {:>7.2f}x {:>10.2e}".format(reward, kernel_t * 1e6, ref_t * 1e6, ref_t / kernel_t, err))
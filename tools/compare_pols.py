@@ -1,6 +1,5 @@
 import numpy as np
 import sys, os
-import fpdf
 from .eval_perturb import plot_perturb
 
 def process_commands(data):
@@ -104,6 +103,7 @@ def compare_pols(pol1, pol2):
     print("pol2: ", pol2_name)
 
     # Initial PDF setup
+    import fpdf
     pdf = fpdf.FPDF(format='letter', unit='in')
     pdf.add_page()
     pdf.set_font('Times','',10.0) 
@@ -0,0 +1,43 @@
+# Converts the aslip walk cycle pickles to the flat binary format that
+# getAllTrajectories memory maps (walkCycle_<speed>.bin next to each .pkl), and
+# checks that every converted file loads back to the same values.
+# Run from the repo root:
+#   python tools/convert_aslip_trajs.py [--dir cassie/trajectory/aslipTrajsTaskSpace]
+import argparse
+import glob
+import os
+import pickle
+import sys
+
+import numpy as np
+
+sys.path.append(".")
+
+from cassie.trajectory.aslip_trajectory import aslip_fields, save_aslip_binary, load_aslip_binary
+
+def convert(pkl_path):
+    with open(pkl_path, "rb") as f:
+        trajectory = pickle.load(f)
+    bin_path = os.path.splitext(pkl_path)[0] + ".bin"
+    save_aslip_binary(trajectory, bin_path)
+
+    loaded = load_aslip_binary(bin_path)
+    for name in aslip_fields:
+        if not np.array_equal(loaded[name], trajectory[name]):
+            raise ValueError("{}: {} differs after conversion".format(bin_path, name))
+    interp = trajectory["pos_f_interp"]
+    t = np.linspace(interp.x[0], interp.x[-1], 1000)
+    if not np.allclose(loaded["pos_f_interp"](t), interp(t)):
+        raise ValueError("{}: pos_f_interp differs after conversion".format(bin_path))
+    return bin_path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dir", type=str, default=os.path.join("cassie", "trajectory", "aslipTrajsTaskSpace"))
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.dir, "walkCycle_*.pkl")))
+    for path in paths:
+        bin_path = convert(path)
+        print("{} -> {} ({} bytes)".format(path, bin_path, os.path.getsize(bin_path)))
+    print("converted {} trajectories".format(len(paths)))
@@ -2,44 +2,15 @@ import sys, os
 sys.path.append("..") # Adds higher directory to python modules path.
 
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.colors as mcolors
-import matplotlib as mpl
 import torch
 import time
 import cmath
 import math
-import ray
 from functools import partial
 
-# from cassie import CassieEnv
-
-def quaternion2euler(quaternion):
-	w = quaternion[0]
-	x = quaternion[1]
-	y = quaternion[2]
-	z = quaternion[3]
-	ysqr = y * y
-	
-	t0 = +2.0 * (w * x + y * z)
-	t1 = +1.0 - 2.0 * (x * x + ysqr)
-	X = math.degrees(math.atan2(t0, t1))
-	
-	t2 = +2.0 * (w * y - z * x)
-	t2 = +1.0 if t2 > +1.0 else t2
-	t2 = -1.0 if t2 < -1.0 else t2
-	Y = math.degrees(math.asin(t2))
-	
-	t3 = +2.0 * (w * z + x * y)
-	t4 = +1.0 - 2.0 * (ysqr + z * z)
-	Z = math.degrees(math.atan2(t3, t4))
+from cassie.quaternion_function import quaternion2euler
 
-	result = np.zeros(3)
-	result[0] = X * np.pi / 180
-	result[1] = Y * np.pi / 180
-	result[2] = Z * np.pi / 180
-	
-	return result
+# from cassie import CassieEnv
 
 @torch.no_grad()
 def eval_mission(cassie_env, policy, num_iters=2):
@@ -98,6 +69,7 @@ def eval_mission(cassie_env, policy, num_iters=2):
 
 
 def plot_mission_data(save_data, missions):
+    import matplotlib.pyplot as plt
     num_missions = len(save_data)
     fig, axs = plt.subplots(num_missions, 3, figsize=(num_missions*5, 15))
     for i in range(num_missions):
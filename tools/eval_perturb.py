@@ -2,17 +2,13 @@ import sys, os
 sys.path.append("..") # Adds higher directory to python modules path.
 
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.colors as mcolors
-import matplotlib as mpl
 import torch
 import time
 import cmath
-import ray
 import copy
 from functools import partial
 
-@ray.remote
+# Run as a ray actor, see compute_perturbs_multi
 class perturb_worker(object):
     def __init__(self, id_num, env_fn, policy, num_angles, wait_time, perturb_duration, start_size, perturb_incr, perturb_body):
         self.id_num = id_num
@@ -25,22 +21,13 @@ class perturb_worker(object):
         self.perturb_incr = perturb_incr
         self.perturb_body = perturb_body
         self.num_phases = self.cassie_env.phaselen + 1
+        self.phase_states = None
 
     @torch.no_grad()
     def reset_to_phase(self, phase):
-        state = torch.Tensor(self.cassie_env.reset_for_test(full_reset=True))
-        self.cassie_env.speed = 0.5
-        for i in range(2*self.num_phases):
-            action = self.policy(state, True)
-            action = action.data.numpy()
-            state, reward, done, _ = self.cassie_env.step(action)
-            state = torch.Tensor(state)
-        for i in range(phase):
-            action = self.policy(state, True)
-            action = action.data.numpy()
-            state, reward, done, _ = self.cassie_env.step(action)
-            state = torch.Tensor(state)
-        return state
+        if self.phase_states is None:
+            self.phase_states = get_phase_states(self.cassie_env, self.policy)
+        return load_phase_state(self.cassie_env, self.policy, self.phase_states, phase)
 
     @torch.no_grad()
     # Runs a perturbation for a single inputted angle and phase
@@ -82,6 +69,42 @@ class perturb_worker(object):
         return self.id_num, dir_ind, phase, max_force, time.time() - eval_start
 
 
+# Simulates 2 cycles from reset_for_test like reset_to_phase, and then saves the
+# env state, observation and (for recurrent policies) the policy's hidden state
+# at every phase of the third cycle. Restoring one of these with
+# load_phase_state is equivalent to calling reset_to_phase with that phase,
+# without replaying the cycles for every trial.
+@torch.no_grad()
+def get_phase_states(env, policy):
+    num_phases = env.phaselen + 1
+    state = reset_to_phase(env, policy, 0)
+    phase_states = []
+    for i in range(num_phases):
+        phase_states.append((env.save_state(), state, get_policy_hidden(policy)))
+        action = policy(state, True)
+        action = action.data.numpy()
+        state, reward, done, _ = env.step(action)
+        state = torch.Tensor(state)
+    return phase_states
+
+def load_phase_state(env, policy, phase_states, phase):
+    env_state, state, hidden = phase_states[phase]
+    env.load_state(env_state)
+    set_policy_hidden(policy, hidden)
+    return state
+
+# Copy of a recurrent policy's LSTM hidden and cell states (None for
+# feedforward policies)
+def get_policy_hidden(policy):
+    if not hasattr(policy, "init_hidden_state"):
+        return None
+    return [h.clone() for h in policy.hidden], [c.clone() for c in policy.cells]
+
+def set_policy_hidden(policy, hidden):
+    if hidden is not None:
+        policy.hidden = [h.clone() for h in hidden[0]]
+        policy.cells = [c.clone() for c in hidden[1]]
+
 # Will reset the env to the given phase by reset_for_test, and then
 # simulating 2 cycle then to the given phase
 @torch.no_grad()
@@ -109,18 +132,20 @@ def compute_perturbs(cassie_env, policy, wait_time=4, perturb_duration=0.2, pert
     state = torch.Tensor(cassie_env.reset_for_test(full_reset=True))
     max_force = np.zeros((num_steps, num_angles))
 
+    phase_states = get_phase_states(cassie_env, policy)
+
     eval_start = time.time()
     for i in range(num_angles):
         for j in range(num_steps):
             print("Testing angle {} ({} out of {}) for phase {}".format(-perturb_dir[i], i+1, num_angles, j))
-            reset_to_phase(cassie_env, policy, j)
+            load_phase_state(cassie_env, policy, phase_states, j)
             curr_size = perturb_size - perturb_incr
             done = False
             curr_start = time.time()
             while not done:
                 curr_size += perturb_incr
                 print("curr size: ", curr_size)
-                reset_to_phase(cassie_env, policy, j)
+                load_phase_state(cassie_env, policy, phase_states, j)
                 curr_time = cassie_env.sim.time()
                 # Apply perturb
                 force_x = curr_size * np.cos(perturb_dir[i])
@@ -167,9 +192,11 @@ def compute_perturbs_multi(env_fn, policy, wait_time=4, perturb_duration=0.2, pe
     num_args = num_angles * num_phases
     
     # Make and start all workers
+    import ray
     print("Using {} processes".format(num_procs))
     ray.init(num_cpus=num_procs)
-    workers = [perturb_worker.remote(i, env_fn, policy, num_angles, wait_time, perturb_duration, perturb_size, perturb_incr, perturb_body) for i in range(num_procs)]
+    remote_worker = ray.remote(perturb_worker)
+    workers = [remote_worker.remote(i, env_fn, policy, num_angles, wait_time, perturb_duration, perturb_size, perturb_incr, perturb_body) for i in range(num_procs)]
     print("made workers")
     eval_start = time.time()
     result_ids = [workers[i].perturb_test_angle.remote(*args[i]) for i in range(num_procs)]
@@ -212,6 +239,9 @@ def progress_bar(curr_ind, total_ind, bar_width, elapsed_time, est_total_time):
     return outstring
 
 def plot_perturb(filename, plotname, max_force):
+    import matplotlib.pyplot as plt
+    import matplotlib.colors as mcolors
+    import matplotlib as mpl
     data = np.load(filename)
     data = np.mean(data, axis=1)
     num_angles = len(data)
@@ -252,7 +282,6 @@ def plot_perturb(filename, plotname, max_force):
 ##### DEPRACATED FUNCTIONS #####
 ################################
 
-@ray.remote
 @torch.no_grad()
 def perturb_worker_old(env_fn, qpos_phase, qvel_phase, policy, angles, wait_time, perturb_duration, perturb_size, perturb_incr, perturb_body, worker_id):
     num_steps = qpos_phase.shape[1]
@@ -336,6 +365,7 @@ def compute_perturbs_multi_old(env_fn, policy, wait_time=4, perturb_duration=0.2
         qpos_phase[:, i+1] = cassie_env.sim.qpos()
         qvel_phase[:, i+1] = cassie_env.sim.qvel()
 
+    import ray
     start_t = time.time()
     ray.init(num_cpus=num_procs)
     result_ids = []
@@ -347,7 +377,7 @@ def compute_perturbs_multi_old(env_fn, policy, wait_time=4, perturb_duration=0.2
         args = (env_fn, qpos_phase, qvel_phase, policy, perturb_dir[angle_split*i:angle_split*(i+1)], wait_time, perturb_duration, 
                     perturb_size, perturb_incr, perturb_body, i)
         print("Starting worker ", i)
-        result_ids.append(perturb_worker.remote(*args))
+        result_ids.append(ray.remote(perturb_worker_old).remote(*args))
     result = ray.get(result_ids)
     print(result)
     print("Got all results")
@@ -0,0 +1,81 @@
+# Record rollouts of a policy once, then score reward variants on them offline.
+# Run from the repo root:
+#   python tools/reward_replay.py record --path ./trained_models/<run> --steps 100000 --out rollouts.npz
+#   python tools/reward_replay.py score --data rollouts.npz [more.npz ...] --rewards clock_smooth clock_strict0.4 iros_paper
+import argparse
+import os
+import pickle
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(".")
+
+from cassie.rewards.reward_replay import RewardRecorder, load_columns, evaluate_reward
+
+def record(args):
+    import torch
+    from util import env_factory
+
+    run_args = pickle.load(open(os.path.join(args.path, "experiment.pkl"), "rb"))
+    reward = args.reward if args.reward is not None else run_args.reward
+    env_fn = env_factory(run_args.env_name, traj=run_args.traj, simrate=run_args.simrate, state_est=run_args.state_est, no_delta=run_args.no_delta,
+                         dynamics_randomization=run_args.dyn_random, mirror=False, clock_based=run_args.clock_based, reward=reward, history=run_args.history)
+    policy = torch.load(os.path.join(args.path, "actor.pt"))
+    policy.eval()
+
+    env = env_fn()
+    recorder = RewardRecorder(env)
+    start = time.time()
+    with torch.no_grad():
+        while len(recorder) < args.steps:
+            state = torch.Tensor(env.reset())
+            if hasattr(policy, "init_hidden_state"):
+                policy.init_hidden_state()
+            done = False
+            traj_len = 0
+            while not done and traj_len < args.traj_len and len(recorder) < args.steps:
+                action = policy(state, deterministic=not args.stochastic)
+                state, reward, done, _ = recorder.step(action.numpy())
+                state = torch.Tensor(state)
+                traj_len += 1
+    recorder.save(args.out)
+    print("recorded {} steps in {:.1f}s to {}".format(len(recorder), time.time() - start, args.out))
+
+def score(args):
+    cols = load_columns(args.data)
+    steps = len(cols["phase"])
+    episodes = max(int(cols["done"].sum()), 1)
+    print("{} steps, {} terminated episodes".format(steps, int(cols["done"].sum())))
+    print("{:<28} {:>10} {:>10} {:>12} {:>10}".format("reward", "mean", "std", "per episode", "time"))
+    for name in args.rewards:
+        start = time.time()
+        rewards = evaluate_reward(cols, name)
+        elapsed = time.time() - start
+        print("{:<28} {:>10.4f} {:>10.4f} {:>12.2f} {:>9.3f}s".format(name, rewards.mean(), rewards.std(), rewards.sum() / episodes, elapsed))
+    print("{:<28} {:>10.4f} {:>10.4f} {:>12.2f}".format("(recorded)", cols["reward"].mean(), cols["reward"].std(), cols["reward"].sum() / episodes))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="command")
+
+    record_parser = subparsers.add_parser("record", help="run a policy and record the reward inputs of every step")
+    record_parser.add_argument("--path", type=str, required=True, help="path to folder containing policy and run details")
+    record_parser.add_argument("--steps", type=int, default=100000, help="number of steps to record")
+    record_parser.add_argument("--traj_len", type=int, default=400, help="maximum episode length")
+    record_parser.add_argument("--reward", type=str, default=None, help="reward to run the env with (defaults to the run's reward)")
+    record_parser.add_argument("--stochastic", default=False, action="store_true", help="sample actions as during training")
+    record_parser.add_argument("--out", type=str, default="rollouts.npz")
+
+    score_parser = subparsers.add_parser("score", help="evaluate rewards on recorded steps")
+    score_parser.add_argument("--data", nargs="+", required=True, help="files written by record")
+    score_parser.add_argument("--rewards", nargs="+", required=True, help="reward names, e.g. iros_paper clock_smooth clock_strict0.4")
+
+    args = parser.parse_args()
+    if args.command == "record":
+        record(args)
+    elif args.command == "score":
+        score(args)
+    else:
+        parser.print_help()
@@ -1,58 +1,15 @@
 import numpy as np
-import matplotlib.pyplot as plt
 import torch
 from torch.autograd import Variable
 import time
 import math
 import random
-import ray
 import copy, sys
 from functools import partial
 
-# Quaternion utility functions. Due to python relative imports and directory structure can't cleanly use cassie.quaternion_function
-def inverse_quaternion(quaternion):
-	result = np.copy(quaternion)
-	result[1:4] = -result[1:4]
-	return result
+from cassie.quaternion_function import euler2quat, inverse_quaternion, quaternion_product, rotate_by_quaternion
 
-def quaternion_product(q1, q2):
-	result = np.zeros(4)
-	result[0] = q1[0]*q2[0]-q1[1]*q2[1]-q1[2]*q2[2]-q1[3]*q2[3]
-	result[1] = q1[0]*q2[1]+q2[0]*q1[1]+q1[2]*q2[3]-q1[3]*q2[2]
-	result[2] = q1[0]*q2[2]-q1[1]*q2[3]+q1[2]*q2[0]+q1[3]*q2[1]
-	result[3] = q1[0]*q2[3]+q1[1]*q2[2]-q1[2]*q2[1]+q1[3]*q2[0]
-	return result
-
-def rotate_by_quaternion(vector, quaternion):
-	q1 = np.copy(quaternion)
-	q2 = np.zeros(4)
-	q2[1:4] = np.copy(vector)
-	q3 = inverse_quaternion(quaternion)
-	q = quaternion_product(q2, q3)
-	q = quaternion_product(q1, q)
-	result = q[1:4]
-	return result
-
-def euler2quat(z=0, y=0, x=0):
-    z = z/2.0
-    y = y/2.0
-    x = x/2.0
-    cz = math.cos(z)
-    sz = math.sin(z)
-    cy = math.cos(y)
-    sy = math.sin(y)
-    cx = math.cos(x)
-    sx = math.sin(x)
-    result =  np.array([
-             cx*cy*cz - sx*sy*sz,
-             cx*sy*sz + cy*cz*sx,
-             cx*cz*sy - sx*cy*sz,
-             cx*cy*sz + sx*cz*sy])
-    if result[0] < 0:
-    	result = -result
-    return result
-
-@ray.remote
+# Run as a ray actor, see eval_commands_multi
 class eval_worker(object):
     def __init__(self, id_num, env_fn, policy, num_steps, max_speed, min_speed):
         self.id_num = id_num
@@ -122,6 +79,7 @@ class eval_worker(object):
         return self.id_num, save_data, time.time() - start_t
 
 def eval_commands_multi(env_fn, policy, num_steps=200, num_commands=4, max_speed=3, min_speed=0, num_iters=4, num_procs=4, filename="test_eval_command.npy"):
+    import ray
     start_t1 = time.time()
     ray.init(num_cpus=num_procs)
     total_data = np.zeros((num_iters, 6))
@@ -139,7 +97,8 @@ def eval_commands_multi(env_fn, policy, num_steps=200, num_commands=4, max_speed
         orient_sign = np.random.choice((-1, 1), num_commands)
         all_orient_schedule[i, :] = orient_schedule * orient_sign
     # Make and start eval workers
-    workers = [eval_worker.remote(i, env_fn, policy, num_steps, max_speed, min_speed) for i in range(num_procs)]
+    remote_worker = ray.remote(eval_worker)
+    workers = [remote_worker.remote(i, env_fn, policy, num_steps, max_speed, min_speed) for i in range(num_procs)]
     eval_ids = [workers[i].run_test.remote(all_speed_schedule[i, :], all_orient_schedule[i, :]) for i in range(num_procs)]
     print("started workers")
     curr_arg_ind = num_procs
@@ -377,7 +336,6 @@ def vis_commands(cassie_env, policy, num_steps=200, num_commands=4, max_speed=1,
 ##### DEPRACATED FUNCTIONS #####
 ################################
 
-@ray.remote
 @torch.no_grad()
 def eval_commands_worker(env_fn, policy, num_steps, num_commands, max_speed, min_speed, num_iters):
     cassie_env = env_fn()
@@ -455,6 +413,7 @@ def eval_commands_worker(env_fn, policy, num_steps, num_commands, max_speed, min
 # TODO: Change to create workers, then pass a single iter to each one. This way, in case a worker finishes before the others
 # it can start running more iters. Can also add running stats of how many more tests to run, w/ loading bar
 def eval_commands_multi_old(env_fn, policy, num_steps=200, num_commands=4, max_speed=3, min_speed=0, num_iters=4, num_procs=4, filename="test_eval_command.npy"):
+    import ray
     start_t1 = time.time()
     ray.init(num_cpus=num_procs)
     result_ids = []
@@ -465,7 +424,7 @@ def eval_commands_multi_old(env_fn, policy, num_steps=200, num_commands=4, max_s
         print("curr iters: ", curr_iters)
         args = (env_fn, policy, num_steps, num_commands, max_speed, min_speed, curr_iters)
         print("Starting worker ", i)
-        result_ids.append(eval_commands_worker.remote(*args))
+        result_ids.append(ray.remote(eval_commands_worker).remote(*args))
     result = ray.get(result_ids)
     # print(result)
     print("Got all results")
@@ -1,4 +1,3 @@
-import torch
 import hashlib, os, pickle
 from collections import OrderedDict
 import sys, time
@@ -27,6 +26,17 @@ def print_logo(subtitle="", option=2):
     print(subtitle)
     print("\n")
 
+# Env names accepted by env_factory and the cassie package attribute for each.
+# Only the module of the requested env gets imported.
+_cassie_envs = {
+    'Cassie-v0':                       'CassieEnv',
+    'CassiePlayground-v0':             'CassiePlayground',
+    'CassieStandingEnv-v0':            'CassieStandingEnv',
+    'CassieNoaccelFootDistOmniscient': 'CassieEnv_noaccel_footdist_omniscient',
+    'CassieFootDist':                  'CassieEnv_footdist',
+    'CassieNoaccelFootDist':           'CassieEnv_noaccel_footdist',
+}
+
 def env_factory(path, traj="walking", simrate=50, clock_based=True, state_est=True, dynamics_randomization=True, mirror=False, no_delta=False, ik_baseline=False, learn_gains=False, reward=None, history=0, fixed_speed=None, **kwargs):
     from functools import partial
 
@@ -43,22 +53,23 @@ def env_factory(path, traj="walking", simrate=50, clock_based=True, state_est=Tr
 
 
     # Custom Cassie Environment
-    if path in ['Cassie-v0', 'CassiePlayground-v0', 'CassieStandingEnv-v0', 'CassieNoaccelFootDistOmniscient', 'CassieFootDist', 'CassieNoaccelFootDist']:
-        from cassie import CassieEnv, CassiePlayground, CassieStandingEnv, CassieEnv_noaccel_footdist_omniscient, CassieEnv_footdist, CassieEnv_noaccel_footdist
+    if path in _cassie_envs:
+        import cassie
+        env_cls = getattr(cassie, _cassie_envs[path])
 
         if path == 'Cassie-v0':
-            # env_fn = partial(CassieEnv, traj=traj, clock_based=clock_based, state_est=state_est, dynamics_randomization=dynamics_randomization, no_delta=no_delta, reward=reward, history=history)
-            env_fn = partial(CassieEnv, traj=traj, simrate=simrate, clock_based=clock_based, state_est=state_est, dynamics_randomization=dynamics_randomization, no_delta=no_delta, learn_gains=learn_gains, ik_baseline=ik_baseline, reward=reward, history=history, fixed_speed=fixed_speed)
+            # env_fn = partial(env_cls, traj=traj, clock_based=clock_based, state_est=state_est, dynamics_randomization=dynamics_randomization, no_delta=no_delta, reward=reward, history=history)
+            env_fn = partial(env_cls, traj=traj, simrate=simrate, clock_based=clock_based, state_est=state_est, dynamics_randomization=dynamics_randomization, no_delta=no_delta, learn_gains=learn_gains, ik_baseline=ik_baseline, reward=reward, history=history, fixed_speed=fixed_speed)
         elif path == 'CassiePlayground-v0':
-            env_fn = partial(CassiePlayground, traj=traj, simrate=simrate, clock_based=clock_based, state_est=state_est, dynamics_randomization=dynamics_randomization, no_delta=no_delta, reward=reward, history=history)
+            env_fn = partial(env_cls, traj=traj, simrate=simrate, clock_based=clock_based, state_est=state_est, dynamics_randomization=dynamics_randomization, no_delta=no_delta, reward=reward, history=history)
         elif path == 'CassieStandingEnv-v0':
-            env_fn = partial(CassieStandingEnv, simrate=simrate, state_est=state_est)
+            env_fn = partial(env_cls, simrate=simrate, state_est=state_est)
         elif path == 'CassieNoaccelFootDistOmniscient':
-            env_fn = partial(CassieEnv_noaccel_footdist_omniscient, simrate=simrate, traj=traj, clock_based=clock_based, state_est=state_est, dynamics_randomization=True, no_delta=no_delta, reward=reward, history=history)
+            env_fn = partial(env_cls, simrate=simrate, traj=traj, clock_based=clock_based, state_est=state_est, dynamics_randomization=True, no_delta=no_delta, reward=reward, history=history)
         elif path == 'CassieFootDist':
-            env_fn = partial(CassieEnv_footdist, traj=traj, simrate=simrate, clock_based=clock_based, state_est=state_est, dynamics_randomization=dynamics_randomization, no_delta=no_delta, reward=reward, history=history)
+            env_fn = partial(env_cls, traj=traj, simrate=simrate, clock_based=clock_based, state_est=state_est, dynamics_randomization=dynamics_randomization, no_delta=no_delta, reward=reward, history=history)
         elif path == 'CassieNoaccelFootDist':
-            env_fn = partial(CassieEnv_noaccel_footdist, traj=traj, simrate=simrate, clock_based=clock_based, state_est=state_est, dynamics_randomization=dynamics_randomization, no_delta=no_delta, reward=reward, history=history)
+            env_fn = partial(env_cls, traj=traj, simrate=simrate, clock_based=clock_based, state_est=state_est, dynamics_randomization=dynamics_randomization, no_delta=no_delta, reward=reward, history=history)
 
 
         # TODO for Yesh: make mirrored_obs an attribute of environment, configured based on setup parameters
@@ -156,6 +167,7 @@ def eval_policy(policy, args, run_args):
     import termios
     import select
     import numpy as np
+    import torch
     from cassie import CassieEnv, CassiePlayground, CassieStandingEnv, CassieEnv_noaccel_footdist_omniscient, CassieEnv_footdist, CassieEnv_noaccel_footdist
 
     def isData():